@@ -0,0 +1,59 @@
+""" Benchmarks the periodic scheduler job against recorded market data
+
+Record a trading day by running the server with MARKET_DATA_RECORD=true, then replay it:
+
+    python benchmarks/replay_tick.py --data market_data --ticks 78
+
+Each tick advances the replay clock by --interval seconds and runs
+update_stock_prices -> update_portfolios -> save_daily_history against the configured database.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded market data through the periodic job')
+    parser.add_argument('--data', default='market_data', help='directory of recorded market data')
+    parser.add_argument('--ticks', type=int, default=78, help='number of ticks to run')
+    parser.add_argument('--interval', type=float, default=300, help='recorded seconds between ticks')
+    parser.add_argument('--repeat', type=int, default=1, help='number of times to replay the day')
+    args = parser.parse_args()
+
+    os.environ['PRICE_PROVIDER'] = 'replay'
+    os.environ['MARKET_DATA_RECORD'] = 'false'
+    os.environ['MARKET_DATA_DIR'] = args.data
+    os.environ['MARKET_DATA_REPLAY_SPEED'] = '0'
+
+    from app import app
+    from src.utils.price_provider import get_price_provider
+    from src.utils.scheduler import update_stock_prices, update_portfolios, save_daily_history
+
+    stages = [update_stock_prices, update_portfolios, save_daily_history]
+
+    with app.app_context():
+        for run in range(args.repeat):
+            provider = get_price_provider()
+            provider.rewind()
+
+            totals = {stage.__name__: 0.0 for stage in stages}
+            start = time.perf_counter()
+
+            for tick in range(args.ticks):
+                for stage in stages:
+                    stage_start = time.perf_counter()
+                    stage()
+                    totals[stage.__name__] += time.perf_counter() - stage_start
+                provider.advance(args.interval)
+
+            elapsed = time.perf_counter() - start
+            print(f'run {run + 1}: {args.ticks} ticks in {elapsed:.2f}s ({elapsed / max(args.ticks, 1):.3f}s per tick)')
+            for name, total in totals.items():
+                print(f'    {name:<22} {total:.2f}s total, {total / max(args.ticks, 1):.3f}s per tick')
+
+
+if __name__ == '__main__':
+    main()
@@ -19,5 +19,57 @@ class AppConfig:
 
     # APScheduler
     SCHEDULER_API_ENABLED = True
+    SCHEDULER_LEASE_TTL = int(os.environ.get('SCHEDULER_LEASE_TTL', 180)) # seconds, lease renewed every third of it
+
+    # market data
+    PRICE_PROVIDER = os.environ.get('PRICE_PROVIDER', 'yahoo') # yahoo, synthetic, replay
+    SYNTHETIC_PRICE_SEED = int(os.environ.get('SYNTHETIC_PRICE_SEED', 0))
+    MARKET_DATA_RECORD = os.environ.get('MARKET_DATA_RECORD', 'false').lower() == 'true'
+    MARKET_DATA_DIR = os.environ.get('MARKET_DATA_DIR', 'market_data')
+    MARKET_DATA_REPLAY_SPEED = float(os.environ.get('MARKET_DATA_REPLAY_SPEED', 1.0))
+    REFRESH_ACTIVE_STOCKS_ONLY = os.environ.get('REFRESH_ACTIVE_STOCKS_ONLY', 'true').lower() == 'true'
+    STOCK_PRICE_BULK = os.environ.get('STOCK_PRICE_BULK', 'true').lower() == 'true'
+    STOCK_PRICE_CHUNK_SIZE = int(os.environ.get('STOCK_PRICE_CHUNK_SIZE', 200))
+    QUOTE_FETCH_WORKERS = int(os.environ.get('QUOTE_FETCH_WORKERS', 8))
+    QUOTE_FETCH_TIMEOUT = float(os.environ.get('QUOTE_FETCH_TIMEOUT', 15)) # seconds per batch of STOCK_PRICE_CHUNK_SIZE tickers
+    QUOTE_FETCH_RETRIES = int(os.environ.get('QUOTE_FETCH_RETRIES', 2))
+    QUOTE_FETCH_BACKOFF = float(os.environ.get('QUOTE_FETCH_BACKOFF', 0.5))
+
+    # scheduler
+    SCHEDULER_FUSED_TICK = os.environ.get('SCHEDULER_FUSED_TICK', 'true').lower() == 'true'
+    INCREMENTAL_VALUATION = os.environ.get('INCREMENTAL_VALUATION', 'true').lower() == 'true' # fused tick, revalues only the portfolios affected since the previous tick
+    STREAMING_MATCHING = os.environ.get('STREAMING_MATCHING', 'false').lower() == 'true' # fused tick only, match each quote batch as it arrives
+    ORDER_MATCHING = os.environ.get('ORDER_MATCHING', 'sql') # sql, book, scan
+    ORDER_EXECUTION = os.environ.get('ORDER_EXECUTION', 'batch') # batch, single
+    EXECUTION_QUEUE = os.environ.get('EXECUTION_QUEUE', 'true').lower() == 'true' # fill market orders on submit
+    PORTFOLIO_VALUATION = os.environ.get('PORTFOLIO_VALUATION', 'sql') # orm, sql, numpy
+    SCHEDULER_SHARD_WORKERS = int(os.environ.get('SCHEDULER_SHARD_WORKERS', 0)) # processes, sharding is off below 2
+
+    # scheduler metrics
+    METRICS_RETENTION_DAYS = int(os.environ.get('METRICS_RETENTION_DAYS', 7))
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', None) # bearer token of the admin endpoints, disabled if not set
+
+    # daily history (intraday portfolio values)
+    ARCHIVE_DAILY_HISTORY = os.environ.get('ARCHIVE_DAILY_HISTORY', 'true').lower() == 'true'
+    HISTORY_DELETE_CHUNK_SIZE = int(os.environ.get('HISTORY_DELETE_CHUNK_SIZE', 1000))
+
+    # price ticks (intraday prices recorded on each refresh)
+    RECORD_PRICE_TICKS = os.environ.get('RECORD_PRICE_TICKS', 'true').lower() == 'true'
+    PRICE_TICK_RETENTION_DAYS = int(os.environ.get('PRICE_TICK_RETENTION_DAYS', 30))
+    PRICE_TICK_FULL_RESOLUTION_DAYS = int(os.environ.get('PRICE_TICK_FULL_RESOLUTION_DAYS', 5))
+    PRICE_TICK_DOWNSAMPLE_MINUTES = int(os.environ.get('PRICE_TICK_DOWNSAMPLE_MINUTES', 30))
+
+    # stock data cache (ttl in seconds, history expires at market close)
+    STOCK_CACHE_SIZE = int(os.environ.get('STOCK_CACHE_SIZE', 1024))
+    STOCK_INFO_CACHE_TTL = int(os.environ.get('STOCK_INFO_CACHE_TTL', 300))
+    STOCK_NEWS_CACHE_TTL = int(os.environ.get('STOCK_NEWS_CACHE_TTL', 900))
+    STOCK_CACHE_STALE_WHILE_REVALIDATE = os.environ.get('STOCK_CACHE_STALE_WHILE_REVALIDATE', 'true').lower() == 'true'
+    STOCK_INFO_STALE_WHILE_REVALIDATE = os.environ.get('STOCK_INFO_STALE_WHILE_REVALIDATE', 'false').lower() == 'true' # info carries the price
+
+    # stock info page (seconds to wait for each part)
+    FAN_OUT_WORKERS = int(os.environ.get('FAN_OUT_WORKERS', 32))
+    STOCK_INFO_TIMEOUT = float(os.environ.get('STOCK_INFO_TIMEOUT', 10))
+    STOCK_NEWS_TIMEOUT = float(os.environ.get('STOCK_NEWS_TIMEOUT', 3))
+    STOCK_HISTORY_TIMEOUT = float(os.environ.get('STOCK_HISTORY_TIMEOUT', 10))
 
     
\ No newline at end of file
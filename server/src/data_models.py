@@ -101,7 +101,39 @@ class Stock(db.Model):
     orders = db.relationship('Order', backref='stock', lazy=True)
 
 
+class StockHistory(db.Model):
+    __table_args__ = (db.UniqueConstraint('ticker', 'date'),)
+    
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+
+    ticker = db.Column(db.String(10), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    open_price = db.Column(db.Float, nullable=False)
+    high_price = db.Column(db.Float, nullable=False)
+    low_price = db.Column(db.Float, nullable=False)
+    close_price = db.Column(db.Float, nullable=False)
+
+
+class StockHistoryCoverage(db.Model):
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+
+    ticker = db.Column(db.String(10), unique=True, nullable=False)
+    start_date = db.Column(db.Date, nullable=False) # earliest date the stored history was fetched from
+
+
+class PriceTick(db.Model):
+    __table_args__ = (db.Index('ix_price_tick_stock_id_timestamp', 'stock_id', 'timestamp'),)
+    
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
+
+    timestamp = db.Column(db.DateTime(timezone=True), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+
+
 class Holding(db.Model):
+    __table_args__ = (db.Index('ix_holding_stock_id_portfolio_id', 'stock_id', 'portfolio_id'),)
+    
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
     stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
@@ -111,6 +143,8 @@ class Holding(db.Model):
 
 
 class Transaction(db.Model):
+    __table_args__ = (db.Index('ix_transaction_transaction_date_portfolio_id', 'transaction_date', 'portfolio_id'),)
+    
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
     stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
@@ -140,7 +174,23 @@ class DailyHistory(db.Model):
     portfolio_value = db.Column(db.Float, nullable=False)
     
 
+class DailyHistoryArchive(db.Model):
+    # intraday history of past days, one row per portfolio and day
+    __table_args__ = (db.UniqueConstraint('portfolio_id', 'date'),)
+    
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
+
+    date = db.Column(db.Date, nullable=False)
+    points = db.Column(db.Integer, nullable=False)
+    # packed little-endian arrays: int64 unix timestamps (UTC) and float64 portfolio values
+    timestamps = db.Column(db.LargeBinary, nullable=False)
+    portfolio_values = db.Column(db.LargeBinary, nullable=False)
+    
+
 class Order(db.Model):
+    __table_args__ = (db.Index('ix_order_status_stock_id_target_price', 'order_status', 'stock_id', 'target_price'),)
+    
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
     portfolio_id = db.Column(db.Integer, db.ForeignKey('portfolio.id'), nullable=False)
@@ -152,4 +202,23 @@ class Order(db.Model):
     order_date = db.Column(db.DateTime(timezone=True), nullable=False)
     # order status: pending, filled, partially filled, cancelled, expired
     order_status = db.Column(db.String(50), nullable=False) 
-    order_expiration = db.Column(db.Date, nullable=True)
\ No newline at end of file
+    order_expiration = db.Column(db.Date, nullable=True)
+
+class SchedulerLease(db.Model):
+    # lease held by the scheduler worker that runs the jobs (databases without advisory locks)
+    name = db.Column(db.String(50), primary_key=True, nullable=False)
+    holder = db.Column(db.String(150), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class SchedulerMetric(db.Model):
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+
+    job = db.Column(db.String(50), nullable=False)
+    # stage of the job, 'total' for the whole job
+    stage = db.Column(db.String(50), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    duration = db.Column(db.Float, nullable=False)
+    rows = db.Column(db.Integer, nullable=True)
+    statements = db.Column(db.Integer, nullable=False)
+    failed = db.Column(db.Boolean, nullable=False, default=False)
@@ -1,3 +1,4 @@
 from .portfolio_sim import *
 from .auth import *
-from .orders import *
\ No newline at end of file
+from .orders import *
+from .admin import *
\ No newline at end of file
@@ -0,0 +1,30 @@
+import hmac
+
+from flask import Blueprint, request, jsonify, current_app, Response
+
+from src.utils.metrics import render_prometheus_metrics
+from src.utils.execution_queue import render_queue_metrics
+
+admin = Blueprint('admin', __name__)
+
+
+@admin.route('/admin/metrics', methods=['GET'])
+def metrics():
+    '''Scheduler job and execution queue metrics in Prometheus text format
+    
+        requires the ADMIN_TOKEN config as a bearer token
+    '''
+    token = current_app.config.get('ADMIN_TOKEN', None)
+    
+    # disabled unless a token is configured
+    if not token:
+        return jsonify(msg='Not found'), 404
+    
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization, f'Bearer {token}'):
+        return jsonify(msg='Unauthorized'), 401
+    
+    return Response(
+        render_prometheus_metrics() + render_queue_metrics(), 
+        mimetype='text/plain; version=0.0.4'
+    )
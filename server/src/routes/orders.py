@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, current_user
 
 from src.utils.transaction import record_transaction
 from src.utils.order import add_order, mark_cancelled
+from src.utils.execution_queue import enqueue_market_order
 from src.utils.time import check_market_closed
 
 orders = Blueprint('orders', __name__)
@@ -83,7 +84,7 @@ def submit_order():
     target_price = request.json.get('targetPrice', None)
     
     try:
-        add_order(
+        order_id = add_order(
             portfolio_id, 
             current_user.id, 
             stock_id, 
@@ -95,6 +96,9 @@ def submit_order():
     except Exception as e:
         return jsonify(msg=str(e)), 400
     
+    # market orders are filled right away when the market is open
+    enqueue_market_order(order_id, order_type)
+    
     return jsonify(msg=f'{order_type} order submitted!'), 200
 
 
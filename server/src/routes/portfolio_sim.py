@@ -1,12 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, current_user, get_jwt_identity
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from src.utils.game import add_game, add_portfolio, get_games_list, get_game_leaderboard
-from src.utils.portfolio import get_latest_portfolio_id, get_portfolio
-from src.utils.stock_data import get_stock_info, get_stock_news, get_stock_history
-from src.utils.transaction import add_stock, get_buy_info, get_sell_info
-from src.utils.time import check_market_closed, get_next_market_date
+from src.utils.portfolio import get_latest_portfolio_id, get_portfolio, get_portfolio_intraday_history
+from src.utils.stock_data import get_stock_overview, sync_stock
+from src.utils.transaction import get_buy_info, get_sell_info
+from src.utils.time import check_market_closed, get_next_market_date, get_est_time
 
 
 portfolio_sim = Blueprint('portfolio_sim', __name__)
@@ -172,6 +172,35 @@ def portfolio(portfolio_id: str):
     ), 200
 
 
+@portfolio_sim.route('/portfolio-history/<portfolio_id>', methods=['GET'])
+@jwt_required()
+def portfolio_history(portfolio_id: str):
+    '''Get the intraday history of a portfolio over several days, including archived days
+
+        args:
+            portfolio_id (int): id of the portfolio
+            start (str): first day (YYYY-MM-DD), defaults to a week before end
+            end (str): last day (YYYY-MM-DD), defaults to today
+    '''
+    portfolio_id = int(portfolio_id)
+    
+    try:
+        end = request.args.get('end', None)
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else get_est_time().date()
+        start = request.args.get('start', None)
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else end - timedelta(days=7)
+        
+        data = get_portfolio_intraday_history(current_user.id, portfolio_id, start, end)
+
+    except Exception as e:
+        return jsonify(msg=str(e)), 400
+
+    return jsonify(
+        data=data,
+        msg="success"
+    ), 200
+
+
 @portfolio_sim.route('/stock-info/<ticker>', methods=['GET'])
 @jwt_required()
 def stock_info(ticker: str):
@@ -183,12 +212,10 @@ def stock_info(ticker: str):
     ticker = ticker.upper()
     
     try:
-        stock_info = get_stock_info(ticker)
-        news = get_stock_news(ticker)
-        history = get_stock_history(ticker, '1y')
+        stock_info, news, history = get_stock_overview(ticker, '1y')
         
         # add stock to database
-        stock_id = add_stock(stock_info, ticker)
+        stock_id = sync_stock(stock_info, ticker)
 
     except Exception as e:
         return jsonify(msg=str(e)), 400
@@ -1,8 +1,21 @@
 from .time import *
 from .scheduler import *
+from .leader import *
+from .metrics import *
+from .cache import *
+from .concurrency import *
+from .price_provider import *
+from .quote_fetcher import *
+from .price_ticks import *
+from .history import *
 from .stock_data import *
 from .portfolio import *
 from .game import *
 from .transaction import *
 from .math_functions import *
-from .order import *
\ No newline at end of file
+from .order_book import *
+from .order import *
+from .execution_queue import *
+from .valuation import *
+from .pipeline import *
+from .sharding import *
\ No newline at end of file
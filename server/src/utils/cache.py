@@ -0,0 +1,149 @@
+import time
+from collections import OrderedDict
+from threading import Lock, Thread
+from typing import Callable, Hashable
+
+from .concurrency import SingleFlight
+
+
+class TTLCache:
+    """ Thread safe in-process cache with per entry expiry and LRU eviction
+        With stale_while_revalidate, expired entries are returned immediately
+        while a background thread reloads them.
+        Concurrent loads of the same key are coalesced into a single call.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, stale_while_revalidate=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        
+        self._entries = OrderedDict() # key -> (value, expires_at)
+        self._refreshing = set()
+        self._lock = Lock()
+        self._flight = SingleFlight()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        """ Gets a fresh value from the cache
+
+        Args:
+            key (Hashable): cache key
+            default (optional): value returned on a miss. Defaults to None.
+
+        Returns:
+            cached value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            
+            if entry is None or entry[1] <= time.time():
+                self.misses += 1
+                return default
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            
+            return entry[0]
+
+    def set(self, key: Hashable, value, expires_at: float=None) -> None:
+        """ Adds a value to the cache, evicting the least recently used entries if full
+
+        Args:
+            key (Hashable): cache key
+            value: value to cache
+            expires_at (float, optional): unix time the value expires. Defaults to now + ttl.
+        """
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable, expires_at: Callable=None):
+        """ Gets a value from the cache, loading it on a miss
+            Values are only cached if the loader does not raise
+
+        Args:
+            key (Hashable): cache key
+            loader (Callable): function that loads the value
+            expires_at (Callable, optional): function that returns the unix time a new value expires. Defaults to now + ttl.
+
+        Returns:
+            cached or loaded value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            stale = entry is not None and self.stale_while_revalidate
+            refresh = False
+            
+            if entry is not None:
+                value, expiry = entry
+                self._entries.move_to_end(key)
+                
+                if expiry > time.time():
+                    self.hits += 1
+                    return value
+            
+            if stale:
+                # only one background refresh per key
+                self.stale_hits += 1
+                refresh = key not in self._refreshing
+                self._refreshing.add(key)
+            else:
+                self.misses += 1
+        
+        if stale:
+            if refresh:
+                Thread(target=self._refresh, args=(key, loader, expires_at), daemon=True).start()
+            return value
+        
+        return self._flight.do(key, lambda: self._load(key, loader, expires_at))
+
+    def _load(self, key: Hashable, loader: Callable, expires_at: Callable=None):
+        value = loader()
+        self.set(key, value, expires_at() if expires_at is not None else None)
+        
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable, expires_at: Callable=None) -> None:
+        try:
+            self._flight.do(key, lambda: self._load(key, loader, expires_at))
+        except Exception as e:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        """ Removes all entries from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """ Gets the hit/miss counters of the cache
+
+        Returns:
+            dict: cache statistics
+        """
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'staleHits': self.stale_hits,
+            'evictions': self.evictions,
+            'coalesced': self._flight.shared
+        }
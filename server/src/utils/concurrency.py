@@ -0,0 +1,143 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from threading import Event, Lock
+from typing import Callable, Dict, Hashable
+
+from flask import current_app, has_app_context
+
+
+def with_app_context(func: Callable) -> Callable:
+    """ Wraps a function so it runs inside the current flask app context
+        Used for work handed off to other threads, which do not inherit the app context
+
+    Args:
+        func (Callable): function to wrap
+
+    Returns:
+        Callable: wrapped function
+    """
+    if not has_app_context():
+        return func
+    
+    app = current_app._get_current_object()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with app.app_context():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class SingleFlight:
+    """ Coalesces concurrent calls with the same key into one call
+        The first caller runs the function, later callers wait for it and share its result or exception
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+        self.shared = 0
+
+    def do(self, key: Hashable, func: Callable):
+        """ Runs func unless a call with the same key is already in flight
+
+        Args:
+            key (Hashable): key of the call
+            func (Callable): function to run
+
+        Returns:
+            result of the call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """ Gets the thread pool shared by request handlers for concurrent upstream calls
+        Pool size is set by the FAN_OUT_WORKERS config
+
+    Returns:
+        ThreadPoolExecutor: shared thread pool
+    """
+    global _executor
+    
+    with _executor_lock:
+        if _executor is None:
+            workers = current_app.config.get('FAN_OUT_WORKERS', 32) if has_app_context() else 32
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fan-out')
+            
+    return _executor
+
+
+def fan_out(tasks: Dict[str, Callable], timeouts: Dict[str, float]=None, fallbacks: Dict[str, object]=None) -> dict:
+    """ Runs tasks concurrently and waits for each until its own deadline
+        Tasks that time out or raise return their fallback, or raise if they have none.
+        Timed out tasks keep running in the background.
+
+    Args:
+        tasks (dict): name of each task and the function to run
+        timeouts (dict, optional): max seconds to wait for each task. Defaults to no limit.
+        fallbacks (dict, optional): values returned for tasks that fail. Defaults to None.
+
+    Raises:
+        TimeoutError: task without a fallback did not finish in time
+        Exception: task without a fallback raised
+
+    Returns:
+        dict: result of each task
+    """
+    timeouts = timeouts or {}
+    fallbacks = fallbacks or {}
+    
+    start = time.monotonic()
+    executor = get_executor()
+    futures = {name: executor.submit(with_app_context(task)) for name, task in tasks.items()}
+    results = {}
+
+    for name, future in futures.items():
+        timeout = timeouts.get(name)
+        remaining = max(0.0, start + timeout - time.monotonic()) if timeout is not None else None
+        
+        try:
+            results[name] = future.result(timeout=remaining)
+        except Exception as e:
+            if name not in fallbacks:
+                raise e
+            results[name] = fallbacks[name]
+
+    return results
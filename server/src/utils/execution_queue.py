@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+from src.data_models import db, Order, Portfolio, Game
+from .order import execute_orders
+from .order_book import MARKET_ORDER_TYPES
+from .time import get_est_time, check_market_closed
+
+
+class ExecutionQueue:
+    """ Fills market orders in a background thread shortly after they are submitted
+        Orders stay 'pending' in the order table until filled, so if the thread or process dies 
+        they are filled by the next scheduler tick instead. The fill locks the portfolio and claims the order row 
+        while it is pending, so an order is never filled by both and neither overwrites the other's cash or holdings.
+    """
+    def __init__(self, max_latencies=1000):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._app = None
+        self._lock = threading.Lock()
+        self.filled = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=max_latencies)
+    
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def enqueue(self, order_id: int) -> None:
+        """ Adds an order to the queue, starting the worker thread in this process if it is not running
+
+        Args:
+            order_id (int): id of the pending market order
+        """
+        with self._lock:
+            if not self.running:
+                self._app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self._run, name='execution-queue', daemon=True)
+                self._thread.start()
+        
+        self._queue.put((order_id, time.monotonic()))
+    
+    def stats(self) -> dict:
+        """ Gets the queue depth, fill counts and fill latency (seconds from submit to commit)
+
+        Returns:
+            dict: queue statistics
+        """
+        latencies = sorted(self.latencies)
+        
+        return {
+            'depth': self.depth,
+            'running': self.running,
+            'filled': self.filled,
+            'cancelled': self.cancelled,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'medianLatency': latencies[len(latencies) // 2] if latencies else 0.0,
+            'maxLatency': latencies[-1] if latencies else 0.0
+        }
+    
+    def _run(self) -> None:
+        while True:
+            order_id, enqueued = self._queue.get()
+            
+            try:
+                with self._app.app_context():
+                    try:
+                        self._execute(order_id, enqueued)
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                self.failed += 1
+                self._app.logger.warning(f'execution queue could not fill order {order_id}: {e}')
+            finally:
+                self._queue.task_done()
+    
+    def _execute(self, order_id: int, enqueued: float) -> None:
+        order = Order.query.join(Portfolio).join(Game).filter(
+            Order.id == order_id,
+            Order.order_status == 'pending',
+            Game.status == 'In Progress'
+        ).first()
+        
+        # cancelled, filled by the tick, or game not running, leave it to the scheduler
+        if order is None or check_market_closed():
+            self.skipped += 1
+            return
+        
+        results = execute_orders([order], get_est_time())
+        db.session.commit()
+        
+        if results['failed']:
+            self.failed += 1
+        elif results['skipped']:
+            self.skipped += 1
+        elif results['filled'] or results['partially filled']:
+            self.filled += 1
+            self.latencies.append(time.monotonic() - enqueued)
+        else:
+            # no holding to sell or not enough cash for one share
+            self.cancelled += 1
+
+
+market_order_queue = ExecutionQueue()
+
+
+def enqueue_market_order(order_id: int, order_type: str) -> bool:
+    """ Queues a new market order for immediate execution if EXECUTION_QUEUE is set and the market is open,
+        otherwise it is filled by the next scheduler tick
+
+    Args:
+        order_id (int): id of the order
+        order_type (str): type of the order
+
+    Returns:
+        bool: whether the order was queued
+    """
+    if not current_app.config.get('EXECUTION_QUEUE', False):
+        return False
+    if order_type not in MARKET_ORDER_TYPES or check_market_closed():
+        return False
+    
+    market_order_queue.enqueue(order_id)
+    
+    return True
+
+
+def render_queue_metrics() -> str:
+    """ Renders the execution queue statistics of this process in the Prometheus text exposition format
+
+    Returns:
+        str: metrics text
+    """
+    stats = market_order_queue.stats()
+    latencies = list(market_order_queue.latencies)
+    
+    lines = [
+        '# HELP execution_queue_depth Market orders waiting in the execution queue',
+        '# TYPE execution_queue_depth gauge',
+        f'execution_queue_depth {stats["depth"]}',
+        '# HELP execution_queue_running Whether the execution queue thread is running',
+        '# TYPE execution_queue_running gauge',
+        f'execution_queue_running {int(stats["running"])}',
+        '# HELP execution_queue_orders_total Market orders taken off the execution queue by result',
+        '# TYPE execution_queue_orders_total counter',
+    ]
+    for result in ['filled', 'cancelled', 'skipped', 'failed']:
+        lines.append(f'execution_queue_orders_total{{result="{result}"}} {stats[result]}')
+    
+    lines += [
+        '# HELP execution_queue_fill_latency_seconds Seconds from submit to committed fill of recent orders',
+        '# TYPE execution_queue_fill_latency_seconds summary',
+        f'execution_queue_fill_latency_seconds{{quantile="0.5"}} {stats["medianLatency"]}',
+        f'execution_queue_fill_latency_seconds{{quantile="1"}} {stats["maxLatency"]}',
+        f'execution_queue_fill_latency_seconds_sum {sum(latencies)}',
+        f'execution_queue_fill_latency_seconds_count {len(latencies)}',
+    ]
+    
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,215 @@
+from datetime import date, datetime, timezone
+from itertools import groupby
+
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+
+from src.data_models import db, DailyHistory, DailyHistoryArchive
+from .time import utc_to_est
+
+
+def pack_history(timestamps: list, values: list) -> tuple:
+    """ Packs an intraday history into compact binary arrays, sorted by time with duplicate times removed
+
+    Args:
+        timestamps (list): list of datetimes, naive datetimes are taken as UTC
+        values (list): portfolio value at each time
+
+    Returns:
+        tuple: number of points, packed timestamps and packed values
+    """
+    seconds = np.array([_unix_seconds(timestamp) for timestamp in timestamps], dtype='<i8')
+    values = np.array(values, dtype='<f8')
+    
+    seconds, first = np.unique(seconds, return_index=True)
+    values = values[first]
+    
+    return len(seconds), seconds.tobytes(), values.tobytes()
+
+
+def unpack_history(archive: DailyHistoryArchive) -> tuple:
+    """ Unpacks the intraday history of an archive row
+
+    Args:
+        archive (DailyHistoryArchive): archived history
+
+    Returns:
+        tuple: list of UTC datetimes and list of portfolio values
+    """
+    seconds = np.frombuffer(archive.timestamps, dtype='<i8')
+    values = np.frombuffer(archive.portfolio_values, dtype='<f8')
+    
+    return (
+        [datetime.fromtimestamp(int(second), tz=timezone.utc) for second in seconds],
+        values.tolist()
+    )
+
+
+def archive_daily_history(before: date, chunk_size=1000) -> int:
+    """ Collapses the intraday history of each portfolio and day before a date into one archive row,
+        then deletes the raw rows in chunks, committing after each chunk so no long lock is held.
+        Safe to rerun after a failure, raw rows left over are merged into the existing archive row.
+
+    Args:
+        before (date): days before this date are archived
+        chunk_size (int, optional): max number of portfolios archived at once and of rows deleted per statement. Defaults to 1000.
+
+    Returns:
+        int: number of raw rows archived
+    """
+    days = db.session.execute(
+        select(DailyHistory.date).where(DailyHistory.date < before).distinct().order_by(DailyHistory.date)
+    ).scalars().all()
+    
+    archived = 0
+    for day in days:
+        archived += _archive_day(day, chunk_size)
+        
+    return archived
+
+
+def delete_daily_history(before: date, chunk_size=1000) -> int:
+    """ Deletes the intraday history before a date in chunks, without archiving it
+
+    Args:
+        before (date): rows of days before this date are deleted
+        chunk_size (int, optional): max number of rows deleted per statement. Defaults to 1000.
+
+    Returns:
+        int: number of rows deleted
+    """
+    ids = db.session.execute(
+        select(DailyHistory.id).where(DailyHistory.date < before)
+    ).scalars().all()
+    
+    _delete_in_chunks(ids, chunk_size)
+    
+    return len(ids)
+
+
+def get_intraday_history(portfolio_id: int, start: date, end: date) -> dict:
+    """ Gets the intraday history of a portfolio over several days from archived and current rows
+
+    Args:
+        portfolio_id (int): id of the portfolio
+        start (date): first day
+        end (date): last day
+
+    Returns:
+        dict: time and portfolio value of each point
+    """
+    archives = DailyHistoryArchive.query.filter(
+        DailyHistoryArchive.portfolio_id == portfolio_id,
+        DailyHistoryArchive.date >= start,
+        DailyHistoryArchive.date <= end
+    ).order_by(
+        DailyHistoryArchive.date
+    ).all()
+    
+    points = []
+    for archive in archives:
+        points.extend(zip(*unpack_history(archive)))
+    
+    rows = db.session.execute(
+        select(DailyHistory.update_time, DailyHistory.portfolio_value).where(
+            DailyHistory.portfolio_id == portfolio_id,
+            DailyHistory.date >= start,
+            DailyHistory.date <= end
+        )
+    ).all()
+    points.extend((row.update_time, row.portfolio_value) for row in rows)
+    
+    points.sort(key=lambda point: _unix_seconds(point[0]))
+    
+    return {
+        'x': [utc_to_est(timestamp).strftime('%Y-%m-%d %H:%M') for timestamp, _ in points],
+        'y': [value for _, value in points]
+    }
+
+
+def _archive_day(day: date, chunk_size: int) -> int:
+    portfolio_ids = db.session.execute(
+        select(DailyHistory.portfolio_id).where(DailyHistory.date == day).distinct().order_by(DailyHistory.portfolio_id)
+    ).scalars().all()
+    
+    # only the rows of one range of portfolio ids are held in memory at a time
+    archived = 0
+    for i in range(0, len(portfolio_ids), chunk_size):
+        ids = portfolio_ids[i:i+chunk_size]
+        archived += _archive_portfolios(day, ids[0], ids[-1], chunk_size)
+    
+    return archived
+
+
+def _archive_portfolios(day: date, first_id: int, last_id: int, chunk_size: int) -> int:
+    rows = db.session.execute(
+        select(
+            DailyHistory.id,
+            DailyHistory.portfolio_id,
+            DailyHistory.update_time,
+            DailyHistory.portfolio_value
+        ).where(
+            DailyHistory.date == day,
+            DailyHistory.portfolio_id.between(first_id, last_id)
+        ).order_by(
+            DailyHistory.portfolio_id,
+            DailyHistory.update_time
+        )
+    ).all()
+    
+    existing = {
+        archive.portfolio_id: archive
+        for archive in DailyHistoryArchive.query.filter(
+            DailyHistoryArchive.date == day,
+            DailyHistoryArchive.portfolio_id.between(first_id, last_id)
+        ).all()
+    }
+    
+    inserts = []
+    updates = []
+    for portfolio_id, history in groupby(rows, key=lambda row: row.portfolio_id):
+        history = list(history)
+        timestamps = [row.update_time for row in history]
+        values = [row.portfolio_value for row in history]
+        
+        # merge rows left over from an interrupted run into the archive
+        archive = existing.get(portfolio_id)
+        if archive is not None:
+            archived_timestamps, archived_values = unpack_history(archive)
+            timestamps = archived_timestamps + timestamps
+            values = archived_values + values
+        
+        points, packed_timestamps, packed_values = pack_history(timestamps, values)
+        archive_row = {
+            'points': points,
+            'timestamps': packed_timestamps,
+            'portfolio_values': packed_values
+        }
+        
+        if archive is None:
+            inserts.append({'portfolio_id': portfolio_id, 'date': day, **archive_row})
+        else:
+            updates.append({'id': archive.id, **archive_row})
+    
+    if inserts:
+        db.session.execute(insert(DailyHistoryArchive), inserts)
+    if updates:
+        db.session.execute(update(DailyHistoryArchive), updates)
+    db.session.commit()
+    
+    _delete_in_chunks([row.id for row in rows], chunk_size)
+    
+    return len(rows)
+
+
+def _delete_in_chunks(ids: list, chunk_size: int) -> None:
+    for i in range(0, len(ids), chunk_size):
+        db.session.execute(delete(DailyHistory).where(DailyHistory.id.in_(ids[i:i+chunk_size])))
+        db.session.commit()
+
+
+def _unix_seconds(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+        
+    return int(timestamp.timestamp())
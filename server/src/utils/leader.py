@@ -0,0 +1,115 @@
+import os
+import socket
+import threading
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select, text, update, delete
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from src.data_models import db, SchedulerLease
+
+
+class LeaderLock:
+    """ Cluster-wide lock that makes exactly one scheduler process run the jobs
+        On PostgreSQL it is a session advisory lock held on a dedicated connection, 
+        released by the database as soon as the process or its connection dies.
+        Other databases use a row in the scheduler_lease table that the holder renews before it expires.
+    """
+    def __init__(self, name='scheduler', ttl=180):
+        self.name = name
+        self.ttl = ttl
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.key = zlib.crc32(name.encode())
+        self._connection = None
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> bool:
+        """ Takes the lock, or renews it if this process already holds it
+
+        Returns:
+            bool: whether this process is the leader
+        """
+        with self._lock:
+            if db.engine.dialect.name == 'postgresql':
+                return self._acquire_advisory()
+            
+            return self._acquire_lease()
+    
+    def release(self) -> None:
+        """ Gives up the lock if this process holds it
+        """
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': self.key})
+                    self._connection.commit()
+                finally:
+                    self._connection.close()
+                    self._connection = None
+            elif db.engine.dialect.name != 'postgresql':
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        delete(SchedulerLease).where(
+                            SchedulerLease.name == self.name,
+                            SchedulerLease.holder == self.holder
+                        )
+                    )
+    
+    def _acquire_advisory(self) -> bool:
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT 1'))
+                self._connection.commit()
+                return True
+            except OperationalError:
+                # connection dropped, so the database released the lock
+                self._connection.invalidate()
+                self._connection.close()
+                self._connection = None
+        
+        connection = db.engine.connect()
+        try:
+            acquired = connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}).scalar()
+            connection.commit()
+        except Exception as e:
+            connection.close()
+            raise e
+        
+        if acquired:
+            self._connection = connection
+        else:
+            connection.close()
+            
+        return bool(acquired)
+    
+    def _acquire_lease(self) -> bool:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expires_at = now + timedelta(seconds=self.ttl)
+        
+        try:
+            with db.engine.begin() as connection:
+                renewed = connection.execute(
+                    update(SchedulerLease).where(
+                        SchedulerLease.name == self.name,
+                        (SchedulerLease.holder == self.holder) | (SchedulerLease.expires_at < now)
+                    ).values(
+                        holder=self.holder,
+                        expires_at=expires_at
+                    )
+                ).rowcount
+                
+                if renewed:
+                    return True
+                
+                if connection.execute(select(SchedulerLease.name).where(SchedulerLease.name == self.name)).first():
+                    return False
+                
+                connection.execute(
+                    insert(SchedulerLease).values(name=self.name, holder=self.holder, expires_at=expires_at)
+                )
+                return True
+        except IntegrityError:
+            # another process created the lease first
+            return False
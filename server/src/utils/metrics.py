@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import event, insert, delete, select
+from sqlalchemy.engine import Engine
+
+from src.data_models import db, SchedulerMetric
+
+
+@dataclass
+class StageMetric:
+    """ Duration, rows touched and SQL statements of one stage of a scheduler job
+    """
+    stage: str
+    started_at: datetime = None
+    duration: float = 0.0
+    rows: int = None
+    statements: int = 0
+    failed: bool = False
+
+
+# stages of the job running in the current thread, None outside of a job
+_job_stages = ContextVar('job_stages', default=None)
+_statements = threading.local()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(*_) -> None:
+    _statements.count = getattr(_statements, 'count', 0) + 1
+
+
+def _statement_count() -> int:
+    return getattr(_statements, 'count', 0)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@contextmanager
+def track_stage(name: str):
+    """ Measures a stage of the scheduler job running in this thread
+        Set rows on the yielded StageMetric to record the number of rows the stage touched.
+        Outside of a job the stage is measured but not recorded.
+
+    Args:
+        name (str): name of the stage
+
+    Yields:
+        StageMetric: metric of the stage
+    """
+    metric = StageMetric(stage=name, started_at=_utc_now())
+    start = time.perf_counter()
+    statements = _statement_count()
+    
+    try:
+        yield metric
+    except Exception as e:
+        metric.failed = True
+        raise e
+    finally:
+        metric.duration = time.perf_counter() - start
+        metric.statements = _statement_count() - statements
+        
+        stages = _job_stages.get()
+        if stages is not None:
+            stages.append(metric)
+
+
+def record_stage(metric: StageMetric) -> None:
+    """ Records a stage measured elsewhere (e.g. in another process) in the job running in this thread
+
+    Args:
+        metric (StageMetric): metric of the stage
+    """
+    stages = _job_stages.get()
+    if stages is not None:
+        stages.append(metric)
+
+
+@contextmanager
+def track_job(name: str):
+    """ Measures a scheduler job and the stages tracked while it runs, 
+        then saves them to the scheduler_metric table and drops metrics older than METRICS_RETENTION_DAYS
+        Metrics are written on their own connection so they are saved even if the job fails.
+
+    Args:
+        name (str): name of the job
+    """
+    stages = []
+    token = _job_stages.set(stages)
+    
+    try:
+        with track_stage('total') as total:
+            yield
+    finally:
+        _job_stages.reset(token)
+        
+        try:
+            save_job_metrics(name, stages)
+        except Exception as e:
+            current_app.logger.warning(f'could not save metrics of {name}: {e}')
+            
+        current_app.logger.info(
+            f'{name} finished in {total.duration:.3f}s: ' + 
+            ', '.join(f'{stage.stage} {stage.duration:.3f}s' for stage in stages if stage is not total)
+        )
+
+
+def save_job_metrics(job: str, stages: list) -> None:
+    """ Saves the stage metrics of a job run and drops metrics older than METRICS_RETENTION_DAYS
+
+    Args:
+        job (str): name of the job
+        stages (list): list of StageMetric objects
+    """
+    retention = current_app.config.get('METRICS_RETENTION_DAYS', 7)
+    
+    with db.engine.begin() as connection:
+        if stages:
+            connection.execute(insert(SchedulerMetric), [
+                {
+                    'job': job,
+                    'stage': stage.stage,
+                    'started_at': stage.started_at,
+                    'duration': stage.duration,
+                    'rows': stage.rows,
+                    'statements': stage.statements,
+                    'failed': stage.failed
+                }
+                for stage in stages
+            ])
+            
+        connection.execute(
+            delete(SchedulerMetric).where(SchedulerMetric.started_at < _utc_now() - timedelta(days=retention))
+        )
+
+
+def render_prometheus_metrics() -> str:
+    """ Renders the recorded scheduler metrics in the Prometheus text exposition format
+        Last values are from the most recent run of each job, max and count cover the retained history
+
+    Returns:
+        str: metrics text
+    """
+    rows = db.session.execute(
+        select(SchedulerMetric).order_by(SchedulerMetric.started_at, SchedulerMetric.id)
+    ).scalars().all()
+    
+    last = {}
+    history = defaultdict(list)
+    for row in rows:
+        last[(row.job, row.stage)] = row
+        history[(row.job, row.stage)].append(row)
+    
+    def labels(job: str, stage: str) -> str:
+        return f'{{job="{job}",stage="{stage}"}}'
+    
+    families = [
+        ('scheduler_stage_duration_seconds', 'gauge', 'Duration of the stage in the last run of the job',
+            lambda key: last[key].duration),
+        ('scheduler_stage_rows', 'gauge', 'Rows touched by the stage in the last run of the job',
+            lambda key: last[key].rows),
+        ('scheduler_stage_sql_statements', 'gauge', 'SQL statements run by the stage in the last run of the job',
+            lambda key: last[key].statements),
+        ('scheduler_stage_failed', 'gauge', 'Whether the stage failed in the last run of the job',
+            lambda key: int(last[key].failed)),
+        ('scheduler_stage_last_run_timestamp_seconds', 'gauge', 'Start time of the stage in the last run of the job',
+            lambda key: last[key].started_at.replace(tzinfo=timezone.utc).timestamp()),
+        ('scheduler_stage_duration_seconds_max', 'gauge', 'Longest duration of the stage in the retained history',
+            lambda key: max(row.duration for row in history[key])),
+        ('scheduler_stage_runs', 'gauge', 'Runs of the stage in the retained history',
+            lambda key: len(history[key])),
+    ]
+    
+    lines = []
+    for name, kind, description, value in families:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        
+        for key in sorted(last):
+            metric_value = value(key)
+            if metric_value is not None:
+                lines.append(f'{name}{labels(*key)} {metric_value}')
+    
+    return '\n'.join(lines) + '\n'
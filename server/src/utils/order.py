@@ -1,9 +1,12 @@
 from datetime import datetime
 import math
-from src.data_models import db, Portfolio, Holding, Stock, Order
+from flask import current_app
+from sqlalchemy import and_, or_, true, update
+from src.data_models import db, Portfolio, Holding, Stock, Order, Game
 from .time import get_est_time, utc_to_est
 from .math_functions import round_number
-from .transaction import add_transaction, update_holding
+from .transaction import new_transaction, apply_holding_change
+from .order_book import find_triggered_orders
 
 def add_order(
     portfolio_id: int,
@@ -13,7 +16,7 @@ def add_order(
     shares: int,
     expiration_date: str,
     target_price: float
-) -> None:
+) -> int:
     portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=user_id).first()
     stock = Stock.query.filter_by(id=stock_id).first()
     
@@ -52,6 +55,8 @@ def add_order(
         db.session.commit()
     except Exception as e:
         raise e
+    
+    return order.id
 
 
 def validate_order(
@@ -151,12 +156,80 @@ def mark_cancelled(order_id: int) -> None:
     
     
 # to be ran in the scheduler
-def check_orders(orders: list) -> None:
+def get_orders_to_check(game_ids: list = None, stock_ids: list = None, full_sync=True) -> list:
+    """Gets the pending orders of games that are 'In Progress' to check against the current prices
+        ORDER_MATCHING selects how: 'sql' asks the database for the triggered orders,
+        'book' looks them up in the in-memory order book, 'scan' returns every pending order
+        Orders are sorted by id so they are filled in the order they were placed
+
+    Args:
+        game_ids (list, optional): only orders of these games. Defaults to all games.
+        stock_ids (list, optional): only orders of these stocks. Defaults to all stocks.
+        full_sync (bool, optional): whether 'book' syncs the order book with the order table first. Defaults to True.
+
+    Returns:
+        list: list of Order objects
+    """
+    matching = current_app.config.get('ORDER_MATCHING', 'sql')
+    
+    if matching == 'sql':
+        return select_triggered_orders(game_ids, stock_ids)
+    if matching == 'book':
+        return find_triggered_orders(game_ids, stock_ids, full_sync)
+    
+    return Order.query.join(Portfolio).join(Game).filter(
+        Game.status == 'In Progress',
+        Game.id.in_(game_ids) if game_ids is not None else true(),
+        Order.stock_id.in_(stock_ids) if stock_ids is not None else true(),
+        Order.order_status == 'pending'
+    ).order_by(
+        Order.id
+    ).all()
+
+
+def select_triggered_orders(game_ids: list = None, stock_ids: list = None) -> list:
+    """Gets the pending orders of games that are 'In Progress' whose conditions are met at the current stock prices
+        with one query joining orders to stocks, backed by the (order_status, stock_id, target_price) index
+
+    Args:
+        game_ids (list, optional): only orders of these games. Defaults to all games.
+        stock_ids (list, optional): only orders of these stocks. Defaults to all stocks.
+
+    Returns:
+        list: list of Order objects sorted by id
+    """
+    return Order.query.join(
+        Stock, Stock.id == Order.stock_id
+    ).join(
+        Portfolio, Portfolio.id == Order.portfolio_id
+    ).join(
+        Game, Game.id == Portfolio.game_id
+    ).filter(
+        Order.order_status == 'pending',
+        Order.stock_id.in_(stock_ids) if stock_ids is not None else true(),
+        or_(
+            and_(Order.order_type.in_(['limit buy', 'stop-loss']), Stock.current_price <= Order.target_price),
+            and_(Order.order_type == 'limit sell', Stock.current_price >= Order.target_price),
+            Order.order_type.in_(['market buy', 'market sell'])
+        ),
+        Game.status == 'In Progress',
+        Game.id.in_(game_ids) if game_ids is not None else true()
+    ).order_by(
+        Order.id
+    ).all()
+
+
+def check_orders(orders: list, fill_time: datetime = None) -> None:
     """Checks if order conditions are met
+        triggered orders are executed as one batch if ORDER_EXECUTION is 'batch', 
+        otherwise each one is executed and committed on its own
 
     Args:
         orders (list): list of Order objects that are pending
+        fill_time (datetime, optional): time of the fills in batch execution. Defaults to now.
     """
+    triggered = []
+    
     for order in orders:
         if order.order_status != 'pending':
             continue
@@ -165,101 +238,210 @@ def check_orders(orders: list) -> None:
         # check limit buy
         if order.order_type == 'limit buy':
             if current_price <= order.target_price:
-                execute_order(order)
+                triggered.append(order)
         # check limit sell
         elif order.order_type == 'limit sell':
             if current_price >= order.target_price:
-                execute_order(order)
+                triggered.append(order)
         # check stop-loss
         elif order.order_type == 'stop-loss':
             if current_price <= order.target_price:
-                execute_order(order)
+                triggered.append(order)
         elif order.order_type == 'market buy' or order.order_type == 'market sell':
+            triggered.append(order)
+    
+    if current_app.config.get('ORDER_EXECUTION', 'single') == 'batch':
+        execute_orders(triggered, fill_time)
+    else:
+        for order in triggered:
             execute_order(order)
 
 
 def execute_order(order: Order) -> None:
-    """Executes the order
+    """Executes the order and commits
 
     Args:
         order (Order): Order object to be executed
     """
+    execute_orders([order])
+    db.session.commit()
+
+
+def execute_orders(orders: list, fill_time: datetime = None) -> dict:
+    """Executes triggered orders as one batch in the current database transaction
+        The portfolios and holdings of the batch are locked and reloaded in one query each, 
+        so fills are computed from the latest cash and shares and no concurrent trade or fill is overwritten.
+        Each order is written inside its own savepoint, so an order that fails is rolled back 
+        and left pending without undoing the rest of the batch. Does not commit.
+        An order is only filled if it can be claimed while still pending, which locks its row until commit,
+        so an order filled concurrently by another process (e.g. the execution queue) is skipped.
+
+    Args:
+        orders (list): list of Order objects whose conditions are met, executed in list order
+        fill_time (datetime, optional): time of the fills. Defaults to now.
+
+    Returns:
+        dict: number of orders filled, partially filled, cancelled, skipped and failed
+    """
+    fill_time = fill_time or get_est_time()
+    results = {'filled': 0, 'partially filled': 0, 'cancelled': 0, 'skipped': 0, 'failed': 0}
+    
+    # holding of each (portfolio id, stock id) pair, None if there is none
+    holdings = {(order.portfolio_id, order.stock_id): None for order in orders}
+    if holdings:
+        for holding in lock_portfolios(
+            {portfolio_id for portfolio_id, _ in holdings},
+            {stock_id for _, stock_id in holdings}
+        ):
+            if (holding.portfolio_id, holding.stock_id) in holdings:
+                holdings[(holding.portfolio_id, holding.stock_id)] = holding
+    
+    for order in orders:
+        key = (order.portfolio_id, order.stock_id)
+        
+        # holding of a pair whose previous order failed is reloaded from the database
+        if key not in holdings:
+            holdings[key] = Holding.query.filter_by(portfolio_id=order.portfolio_id, stock_id=order.stock_id).first()
+        
+        try:
+            with db.session.begin_nested():
+                claimed = _claim_order(order)
+                if claimed:
+                    holdings[key] = _fill_order(order, holdings[key], fill_time)
+            
+            if claimed:
+                results[order.order_status] += 1
+            else:
+                db.session.refresh(order)
+                results['skipped'] += 1
+        except Exception as e:
+            holdings.pop(key, None)
+            results['failed'] += 1
+            current_app.logger.warning(f'could not execute order {order.id}: {e}')
+    
+    return results
+
+
+def lock_portfolios(portfolio_ids: set, stock_ids: set = None) -> list:
+    """Locks portfolios and their holdings until commit and reloads them from the database
+        Rows are locked in id order, portfolios before holdings, like every other writer of cash and holdings
+
+    Args:
+        portfolio_ids (set): ids of the portfolios
+        stock_ids (set, optional): only holdings of these stocks. Defaults to all holdings.
+
+    Returns:
+        list: Holding objects of the portfolios
+    """
+    Portfolio.query.filter(
+        Portfolio.id.in_(portfolio_ids)
+    ).order_by(
+        Portfolio.id
+    ).with_for_update().populate_existing().all()
+    
+    return Holding.query.filter(
+        Holding.portfolio_id.in_(portfolio_ids),
+        Holding.stock_id.in_(stock_ids) if stock_ids is not None else true()
+    ).order_by(
+        Holding.id
+    ).with_for_update().populate_existing().all()
+
+
+def _claim_order(order: Order) -> bool:
+    # locks the order row if it is still pending in the database
+    claimed = db.session.execute(
+        update(Order).where(
+            Order.id == order.id,
+            Order.order_status == 'pending'
+        ).values(
+            order_status='pending'
+        ).execution_options(
+            synchronize_session=False
+        )
+    ).rowcount
+    
+    return claimed == 1
+
+
+def _fill_order(order: Order, holding: Holding, fill_time: datetime) -> Holding:
+    # writes the fill of one order, returns the holding after the fill
+    portfolio = order.portfolio
     price = order.stock.current_price
-    fee = order.portfolio.parent_game.transaction_fee
-    type = order.portfolio.parent_game.fee_type
-    cash = order.portfolio.available_cash
-    shares = order.shares
-    full_shares = shares
-    order_type = order.order_type
-    
-    def calculate_value(val: float, fee: float, type: str) -> float:
-        if type == 'Flat Fee':
+    transaction_type = 'buy' if order.order_type in ['limit buy', 'market buy'] else 'sell'
+    
+    if transaction_type == 'sell' and holding is None:
+        order.order_status = 'cancelled'
+        return holding
+    
+    shares, value = calculate_fill(
+        order.order_type,
+        order.shares,
+        price,
+        portfolio.available_cash,
+        portfolio.parent_game.transaction_fee,
+        portfolio.parent_game.fee_type,
+        holding.shares_owned if holding is not None else None
+    )
+    
+    if shares <= 0:
+        order.order_status = 'cancelled'
+        return holding
+    
+    new_transaction(holding, order.portfolio_id, order.stock_id, transaction_type, shares, price, fill_time)
+    holding = apply_holding_change(holding, order.portfolio_id, order.stock_id, shares, price, transaction_type)
+    
+    portfolio.available_cash = round_number(portfolio.available_cash - value)
+    order.order_status = 'partially filled' if shares < order.shares else 'filled'
+    
+    return holding
+
+
+def calculate_fill(
+    order_type: str,
+    shares: int,
+    price: float,
+    cash: float,
+    fee: float,
+    fee_type: str,
+    shares_owned: int = None
+) -> tuple:
+    """Calculates how many shares of an order can be filled and the cash it costs
+        buys are partially filled if there is not enough cash, sells are capped at the shares owned
+
+    Args:
+        order_type (str): type of order
+        shares (int): number of shares of the order
+        price (float): price per share
+        cash (float): available cash in the portfolio
+        fee (float): transaction fee set by the game
+        fee_type (str): type of fee (Flat Fee or Percentage)
+        shares_owned (int, optional): shares owned of the stock, required for sells. Defaults to None.
+
+    Returns:
+        tuple: number of shares filled and cash value of the fill including the fee (negative for sells)
+    """
+    def calculate_value(val: float) -> float:
+        if fee_type == 'Flat Fee':
             return val + fee
-        elif type == 'Percentage':
+        elif fee_type == 'Percentage':
             return val + abs(val) * fee
     
-    # execute buy
     if order_type == 'limit buy' or order_type == 'market buy':
-        transaction_type = 'buy'
-        value = calculate_value(shares*price, fee, type)
+        value = calculate_value(shares*price)
         
         # if user does not have enough cash, partially fill the order
-        if value > order.portfolio.available_cash:
-            if type == 'Flat Fee':
+        if value > cash:
+            if fee_type == 'Flat Fee':
                 shares = math.floor((cash - fee) / price)
-            elif type == 'Percentage':
+            elif fee_type == 'Percentage':
                 shares = math.floor(cash / (price * (1 + fee)))
                 
-        value = calculate_value(shares*price, fee, type)
-            
-    # execute sell
-    elif order_type == 'limit sell' or order_type == 'stop-loss' or order_type == 'market sell':
-        holding = Holding.query.filter_by(
-            portfolio_id=order.portfolio_id,
-            stock_id=order.stock_id
-        ).first()
-        
-        if holding is None:
-            order.order_status = 'cancelled'
-            db.session.commit()
-            return
-        else:
-            shares_owned = holding.shares_owned
-        
-        # sell all shares if order shares exceed shares owned
-        shares = min(shares_owned, order.shares)
-        transaction_type = 'sell'
-        value = calculate_value(-1*shares*price, fee, type)
-        
-    # record transaction and update holdings if shares are greater than 0
-    if shares > 0:
-        add_transaction(
-            order.portfolio_id,
-            order.stock_id,
-            transaction_type,
-            shares,
-            price
-        )
-        update_holding(
-            order.portfolio_id,
-            order.stock_id,
-            shares,
-            price,
-            transaction_type
-        )
-        
-        # update portfolio cash
-        order.portfolio.available_cash = round_number(
-            order.portfolio.available_cash - value
-        )
-        if shares < full_shares:
-            order.order_status = 'partially filled'
-        else:
-            order.order_status = 'filled'
-        db.session.commit()
-    else:
-        order.order_status = 'cancelled'
-        db.session.commit()
+        return shares, calculate_value(shares*price)
+    
+    # sell all shares if order shares exceed shares owned
+    shares = min(shares_owned, shares)
+    
+    return shares, calculate_value(-1*shares*price)
 
 
 def check_order_expired(orders: list) -> None:
@@ -0,0 +1,211 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from threading import Lock
+
+from sqlalchemy import select
+
+from src.data_models import db, Order, Stock, Portfolio, Game
+
+BOOK_ORDER_TYPES = ('limit buy', 'limit sell', 'stop-loss')
+MARKET_ORDER_TYPES = ('market buy', 'market sell')
+
+
+class OrderBook:
+    """ Pending limit buys, limit sells and stop-losses of each stock, sorted by target price
+        A new price only touches the orders whose trigger it crossed, found by bisecting the sorted targets:
+        limit buys and stop-losses trigger at or below their target, limit sells at or above it.
+        The book lives in the worker only: it is loaded from the order table on first use and synced with it 
+        once per tick, so orders added or cancelled by the web processes are picked up.
+        Between syncs only orders placed since the last load are added (by id), 
+        cancelled and filled orders stay in the book until the next sync and are dropped by the pending filter of the lookup.
+    """
+    def __init__(self):
+        # stock id -> order type -> sorted list of (target price, order id)
+        self._books = defaultdict(lambda: {order_type: [] for order_type in BOOK_ORDER_TYPES})
+        # order id -> (stock id, order type, target price)
+        self._orders = {}
+        self._lock = Lock()
+        # highest order id loaded into the book
+        self._last_id = 0
+        self.loaded = False
+    
+    def __len__(self) -> int:
+        return len(self._orders)
+    
+    def rebuild(self) -> None:
+        """ Reloads the book from the pending orders in the order table
+        """
+        rows = db.session.execute(
+            select(Order.id, Order.stock_id, Order.order_type, Order.target_price).where(
+                Order.order_status == 'pending',
+                Order.order_type.in_(BOOK_ORDER_TYPES)
+            )
+        ).all()
+        
+        with self._lock:
+            self._books.clear()
+            self._orders.clear()
+            self._last_id = 0
+            
+            for row in rows:
+                self._insert(*row)
+                
+            self.loaded = True
+    
+    def sync(self) -> None:
+        """ Adds pending orders missing from the book and removes orders that are no longer pending
+            Reads the ids of every pending order, so it is meant to run once per tick
+        """
+        if not self.loaded:
+            self.rebuild()
+            return
+        
+        pending = set(db.session.execute(
+            select(Order.id).where(
+                Order.order_status == 'pending',
+                Order.order_type.in_(BOOK_ORDER_TYPES)
+            )
+        ).scalars().all())
+        
+        with self._lock:
+            for order_id in set(self._orders) - pending:
+                self._delete(order_id)
+                
+            new = pending - set(self._orders)
+        
+        if new:
+            rows = db.session.execute(
+                select(Order.id, Order.stock_id, Order.order_type, Order.target_price).where(
+                    Order.id.in_(new)
+                )
+            ).all()
+            
+            with self._lock:
+                for row in rows:
+                    self._insert(*row)
+    
+    def load_new(self) -> None:
+        """ Adds the pending orders placed since the book was last loaded, reading only orders with a higher id
+            Orders whose id was assigned before but committed after the last load are added by the next sync
+        """
+        if not self.loaded:
+            self.rebuild()
+            return
+        
+        rows = db.session.execute(
+            select(Order.id, Order.stock_id, Order.order_type, Order.target_price).where(
+                Order.id > self._last_id,
+                Order.order_status == 'pending',
+                Order.order_type.in_(BOOK_ORDER_TYPES)
+            )
+        ).all()
+        
+        with self._lock:
+            for row in rows:
+                self._insert(*row)
+    
+    def triggered(self, stock_id: int, price: float) -> list:
+        """ Gets the orders of a stock whose target price was crossed by a price
+
+        Args:
+            stock_id (int): id of the stock
+            price (float): current price of the stock
+
+        Returns:
+            list: ids of the triggered orders
+        """
+        if price is None:
+            return []
+        
+        with self._lock:
+            book = self._books.get(stock_id)
+            if book is None:
+                return []
+            
+            buys = book['limit buy']
+            sells = book['limit sell']
+            stops = book['stop-loss']
+            
+            return (
+                [order_id for _, order_id in buys[bisect_left(buys, (price,)):]] +
+                [order_id for _, order_id in sells[:bisect_right(sells, (price, float('inf')))]] +
+                [order_id for _, order_id in stops[bisect_left(stops, (price,)):]]
+            )
+    
+    def stock_ids(self) -> list:
+        """ Gets the ids of the stocks with orders in the book
+
+        Returns:
+            list: stock ids
+        """
+        with self._lock:
+            return [stock_id for stock_id, book in self._books.items() if any(book.values())]
+    
+    def _insert(self, order_id: int, stock_id: int, order_type: str, target_price: float) -> None:
+        if order_id in self._orders or order_type not in BOOK_ORDER_TYPES or target_price is None:
+            return
+        
+        insort(self._books[stock_id][order_type], (target_price, order_id))
+        self._orders[order_id] = (stock_id, order_type, target_price)
+        self._last_id = max(self._last_id, order_id)
+    
+    def _delete(self, order_id: int) -> None:
+        entry = self._orders.pop(order_id, None)
+        if entry is None:
+            return
+        
+        stock_id, order_type, target_price = entry
+        orders = self._books[stock_id][order_type]
+        index = bisect_left(orders, (target_price, order_id))
+        
+        if index < len(orders) and orders[index] == (target_price, order_id):
+            orders.pop(index)
+
+
+pending_order_book = OrderBook()
+
+
+def find_triggered_orders(game_ids: list = None, stock_ids: list = None, full_sync=True) -> list:
+    """ Gets the pending orders of games that are 'In Progress' that can be filled at the current stock prices,
+        limit and stop orders are looked up in the order book, market orders are always included
+
+    Args:
+        game_ids (list, optional): only orders of these games. Defaults to all games.
+        stock_ids (list, optional): only orders of these stocks. Defaults to all stocks.
+        full_sync (bool, optional): whether to sync the book with the order table first, 
+            otherwise only new orders are added. Defaults to True.
+
+    Returns:
+        list: Order objects sorted by id
+    """
+    if full_sync:
+        pending_order_book.sync()
+    else:
+        pending_order_book.load_new()
+    
+    book_stock_ids = pending_order_book.stock_ids()
+    if stock_ids is not None:
+        book_stock_ids = list(set(book_stock_ids) & set(stock_ids))
+        
+    prices = db.session.execute(
+        select(Stock.id, Stock.current_price).where(Stock.id.in_(book_stock_ids))
+    ).all() if book_stock_ids else []
+    
+    order_ids = [
+        order_id 
+        for stock_id, price in prices 
+        for order_id in pending_order_book.triggered(stock_id, price)
+    ]
+    
+    query = Order.query.join(Portfolio).join(Game).filter(
+        Game.status == 'In Progress',
+        Order.order_status == 'pending',
+        Order.id.in_(order_ids) | Order.order_type.in_(MARKET_ORDER_TYPES)
+    )
+    
+    if game_ids is not None:
+        query = query.filter(Game.id.in_(game_ids))
+    if stock_ids is not None:
+        query = query.filter(Order.stock_id.in_(stock_ids))
+    
+    return query.order_by(Order.id).all()
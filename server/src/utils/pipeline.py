@@ -0,0 +1,316 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import Date, DateTime, func, insert, literal, select, true
+from sqlalchemy.orm import selectinload
+
+from src.data_models import db, Game, Portfolio, Stock, DailyHistory
+from .time import get_est_time
+from .order import check_orders, get_orders_to_check
+from .scheduler import apply_stock_prices, get_active_stocks
+from .stock_data import fetch_stock_prices
+from .valuation import (
+    value_portfolios_orm, value_portfolios_sql, value_portfolios_numpy, rank_portfolios, 
+    competition_ranks, IncrementalValuation
+)
+from .metrics import track_stage
+
+
+@dataclass
+class TickSnapshot:
+    """ Active games and stocks loaded once per tick, the number of portfolios in those games,
+        the ids of the portfolios changed by fills and the orders checked by the tick that are still pending
+        Portfolios and holdings are not part of the snapshot, they are read when they are written
+        (after the new prices are applied) so trades made during the quote fetch are not overwritten
+    """
+    update_time: datetime
+    games: list
+    stocks: list
+    portfolio_count: int = 0
+    orders: list = field(default_factory=list)
+    filled: set = field(default_factory=set)
+    revalued: int = 0
+    skipped: int = 0
+
+
+_valuation = IncrementalValuation()
+
+
+def load_tick_snapshot(game_ids: list = None) -> TickSnapshot:
+    """ Loads the games and stocks the periodic tick needs in a fixed number of queries
+        Stocks are loaded before they are accessed through holdings and orders 
+        so those lookups hit the session identity map
+
+    Args:
+        game_ids (list, optional): ids of the games to load. Defaults to all games that are 'In Progress'.
+
+    Returns:
+        TickSnapshot: data for the tick
+    """
+    games = Game.query.filter(
+        Game.status == 'In Progress',
+        Game.id.in_(game_ids) if game_ids is not None else true()
+    ).all()
+    
+    if current_app.config.get('REFRESH_ACTIVE_STOCKS_ONLY', False):
+        stocks = get_active_stocks()
+    else:
+        stocks = Stock.query.all()
+    
+    portfolio_count = db.session.scalar(
+        select(func.count(Portfolio.id)).where(Portfolio.game_id.in_([game.id for game in games]))
+    ) if games else 0
+    
+    return TickSnapshot(
+        update_time=get_est_time(),
+        games=games,
+        stocks=stocks,
+        portfolio_count=portfolio_count
+    )
+
+
+def load_portfolios(games: list) -> list:
+    """ Loads the portfolios and holdings of games, replacing any copies already in the session
+
+    Args:
+        games (list): list of Game objects
+
+    Returns:
+        list: the games with their portfolios and holdings loaded
+    """
+    if not games:
+        return []
+    
+    return Game.query.filter(
+        Game.id.in_([game.id for game in games])
+    ).options(
+        selectinload(Game.portfolios).selectinload(Portfolio.holdings)
+    ).populate_existing().all()
+
+
+@contextmanager
+def _keep_loaded():
+    # commits made while filling orders would otherwise expire the whole snapshot
+    session = db.session()
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    
+    try:
+        yield
+    finally:
+        session.expire_on_commit = expire_on_commit
+
+
+def run_tick() -> TickSnapshot:
+    """ Runs the periodic job as one pipeline over a single snapshot:
+        quote fetch, order matching, valuation, ranking and history recording, 
+        committed once at the end
+
+    Returns:
+        TickSnapshot: snapshot of the tick after it was processed
+    """
+    with track_stage('snapshot_load') as stage:
+        snapshot = load_tick_snapshot()
+        stage.rows = len(snapshot.games)
+    
+    if current_app.config.get('STREAMING_MATCHING', False):
+        stream_quotes(snapshot)
+    else:
+        # quote fetch
+        with track_stage('quote_fetch') as stage:
+            data, summary = fetch_stock_prices([stock.ticker for stock in snapshot.stocks])
+            stage.rows = len(snapshot.stocks) - len(summary.failed)
+            
+        with track_stage('price_update') as stage:
+            apply_stock_prices(snapshot.stocks, data, snapshot.update_time)
+            stage.rows = len(snapshot.stocks)
+        
+        current_app.logger.info(f'stock price refresh: {summary.as_dict()}')
+        
+        # order matching
+        with track_stage('order_matching') as stage:
+            stage.rows = match_orders(snapshot)
+    
+    # valuation and ranking
+    for game in snapshot.games:
+        game.last_updated = snapshot.update_time
+    
+    try:
+        value_snapshot(snapshot, current_app.config.get('INCREMENTAL_VALUATION', False))
+        
+        current_app.logger.info(f'portfolio valuation: revalued {snapshot.revalued}, skipped {snapshot.skipped}')
+        
+        # history
+        with track_stage('history') as stage:
+            stage.rows = record_history(snapshot)
+            db.session.commit()
+    except Exception as e:
+        _valuation.reset()
+        raise e
+    
+    return snapshot
+
+
+def stream_quotes(snapshot: TickSnapshot) -> None:
+    """ Fetches quotes and matches orders one quote batch at a time, as each batch arrives
+        Prices of the batch are applied and its triggered orders filled at the time the quotes arrived, 
+        then committed so the fills do not wait for the slowest batch.
+        Stocks whose quotes failed keep their previous price and are matched once the fetch is done.
+        A batch that fails to apply is rolled back and fetched again.
+        Fills lock and reload the portfolios and holdings they write, so each batch sees trades committed before it
+
+    Args:
+        snapshot (TickSnapshot): data for the tick
+    """
+    stocks = {stock.ticker: stock for stock in snapshot.stocks}
+    matched = []
+    
+    def on_quotes(quotes: dict) -> None:
+        fill_time = get_est_time()
+        batch = [stocks[ticker] for ticker in quotes]
+        pending = len(snapshot.orders)
+        
+        try:
+            apply_stock_prices(batch, quotes, snapshot.update_time)
+            # the order book is synced once per tick, by the first batch
+            checked = match_orders(snapshot, [stock.id for stock in batch], fill_time, full_sync=not matched)
+            db.session.commit()
+            matched.append(checked)
+        except Exception as e:
+            # the fetcher retries the batch
+            db.session.rollback()
+            del snapshot.orders[pending:]
+            current_app.logger.warning(f'quote batch of {len(batch)} stocks failed: {e}')
+            raise e
+    
+    # quote fetch, with price updates and order matching of each batch
+    with track_stage('quote_fetch') as stage:
+        with _keep_loaded():
+            data, summary = fetch_stock_prices(list(stocks), on_quotes=on_quotes)
+        stage.rows = len(snapshot.stocks) - len(summary.failed)
+    
+    current_app.logger.info(f'stock price refresh: {summary.as_dict()}, orders checked: {sum(matched)}')
+    
+    # order matching of the stocks without a new quote
+    with track_stage('order_matching') as stage:
+        failed = [stocks[ticker] for ticker in summary.failed]
+        stage.rows = match_orders(snapshot, [stock.id for stock in failed], full_sync=not matched) if failed else 0
+
+
+def match_orders(snapshot: TickSnapshot, stock_ids: list = None, fill_time: datetime = None, full_sync=True) -> int:
+    """ Fills the pending orders of the snapshot whose conditions are met
+        Orders are loaded after the new prices are applied, 
+        only the triggered ones unless ORDER_MATCHING is 'scan'.
+        The executors lock and reload the portfolios and holdings they fill against
+
+    Args:
+        snapshot (TickSnapshot): data for the tick
+        stock_ids (list, optional): only orders of these stocks. Defaults to all stocks.
+        fill_time (datetime, optional): time of the fills. Defaults to the current time.
+        full_sync (bool, optional): whether the order book is synced with the order table first. Defaults to True.
+
+    Returns:
+        int: number of orders checked
+    """
+    orders = get_orders_to_check([game.id for game in snapshot.games], stock_ids, full_sync)
+    
+    with _keep_loaded():
+        check_orders(orders, fill_time)
+    
+    snapshot.filled.update(order.portfolio_id for order in orders if order.order_status != 'pending')
+    snapshot.orders += [order for order in orders if order.order_status == 'pending']
+    
+    return len(orders)
+
+
+def value_snapshot(snapshot: TickSnapshot, incremental=False) -> None:
+    """ Values and ranks the portfolios of the snapshot's games with the PORTFOLIO_VALUATION engine:
+        one aggregate query and window function ranks ('sql'), flat arrays ('numpy'),
+        or the ORM over portfolios and holdings loaded after order matching ('orm').
+        With incremental, only the portfolios affected since the previous tick are revalued (every portfolio 
+        of the affected games with numpy and orm) and only their games are reranked.
+        The number of portfolios left as they were is recorded as the rows of the 'valuation_skipped' stage
+
+    Args:
+        snapshot (TickSnapshot): data for the tick
+        incremental (bool, optional): whether to revalue incrementally. Defaults to False.
+    """
+    valuation = current_app.config.get('PORTFOLIO_VALUATION', 'orm')
+    game_ids = [game.id for game in snapshot.games]
+    portfolio_ids = None
+    
+    with track_stage('valuation') as stage:
+        if incremental:
+            portfolio_ids, game_ids = _valuation.affected(game_ids, snapshot.update_time)
+        games = [game for game in snapshot.games if game.id in set(game_ids)]
+        
+        if valuation == 'numpy':
+            snapshot.revalued = value_portfolios_numpy(snapshot.update_time, game_ids)
+        elif valuation == 'sql':
+            snapshot.revalued = value_portfolios_sql(snapshot.update_time, game_ids, portfolio_ids)
+        else:
+            games = load_portfolios(games)
+            value_portfolios_orm(games, snapshot.update_time)
+            snapshot.revalued = sum(len(game.portfolios) for game in games)
+        stage.rows = snapshot.revalued
+    
+    with track_stage('valuation_skipped') as stage:
+        snapshot.skipped = snapshot.portfolio_count - snapshot.revalued
+        stage.rows = snapshot.skipped
+    
+    # numpy ranks while valuing
+    if valuation == 'sql':
+        with track_stage('ranking') as stage:
+            stage.rows = rank_portfolios(game_ids)
+    elif valuation != 'numpy':
+        with track_stage('ranking') as stage:
+            rank_snapshot(snapshot, games)
+            stage.rows = sum(len(game.portfolios) for game in games)
+
+
+def record_history(snapshot: TickSnapshot) -> int:
+    """ Records the value of each portfolio of the snapshot's games in the daily history with one statement
+
+    Args:
+        snapshot (TickSnapshot): data for the tick
+
+    Returns:
+        int: number of rows recorded
+    """
+    if not snapshot.games:
+        return 0
+    
+    db.session.flush()
+    
+    return db.session.execute(
+        insert(DailyHistory).from_select(
+            ['portfolio_id', 'date', 'update_time', 'portfolio_value'],
+            select(
+                Portfolio.id,
+                literal(snapshot.update_time.date(), Date),
+                literal(snapshot.update_time, DateTime(timezone=True)),
+                Portfolio.current_value
+            ).where(
+                Portfolio.game_id.in_([game.id for game in snapshot.games])
+            )
+        )
+    ).rowcount
+
+
+def rank_snapshot(snapshot: TickSnapshot, games: list = None) -> None:
+    """ Sets the overall and daily rank of each portfolio in the snapshot
+
+    Args:
+        snapshot (TickSnapshot): data for the tick
+        games (list, optional): games of the snapshot to rank. Defaults to all of them.
+    """
+    for game in (snapshot.games if games is None else games):
+        portfolios = game.portfolios
+        overall_ranks = competition_ranks([portfolio.current_value for portfolio in portfolios])
+        daily_ranks = competition_ranks([portfolio.day_change for portfolio in portfolios])
+        
+        for portfolio, overall_rank, daily_rank in zip(portfolios, overall_ranks, daily_ranks):
+            portfolio.overall_rank = overall_rank
+            portfolio.daily_rank = daily_rank
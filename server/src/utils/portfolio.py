@@ -1,7 +1,10 @@
+from datetime import date
+
 from src.data_models import Portfolio, Holding, Transaction, DailyHistory, ClosingHistory
 from .time import get_prev_market_date, utc_to_est
 from .math_functions import round_number
 from .order import get_orders
+from .history import get_intraday_history
 
 
 # getting data
@@ -171,6 +174,29 @@ def get_portfolio_history(portfolio_id: int) -> dict:
     }
     
     
+def get_portfolio_intraday_history(user_id: int, portfolio_id: int, start: date, end: date) -> dict:
+    """ Gets the intraday history of a portfolio over several days, including archived days
+
+    Args:
+        user_id (int): id of the user
+        portfolio_id (int): database id of the portfolio
+        start (date): first day
+        end (date): last day
+
+    Raises:
+        Exception: portfolio does not exist
+
+    Returns:
+        dict: time and portfolio value of each point
+    """
+    portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=user_id).first()
+    
+    if portfolio is None:
+        raise Exception('Portfolio does not exist')
+    
+    return get_intraday_history(portfolio_id, start, end)
+
+
 def get_holdings_breakdown(portfolio_id: int) -> dict:
     """ Gets the value of each holding in a portfolio
 
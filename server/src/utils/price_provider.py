@@ -0,0 +1,500 @@
+import json
+import math
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from threading import Lock
+from typing import List, Dict
+
+import pandas as pd
+import yfinance as yf
+from flask import current_app, has_app_context
+from yfinance.const import _QUERY1_URL_
+from yfinance.data import YfData
+
+from .time import get_est_time, get_period_start
+
+
+class PriceProvider(ABC):
+    """ Interface for market data sources used by stock_data and the scheduler
+        Responses follow the yfinance shapes so they can be parsed the same way.
+        Providers must implement get_info, get_history, get_news and get_quotes
+    """
+    name = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'PriceProvider':
+        """ Creates the provider from the app config
+
+        Args:
+            config (dict): flask app config
+
+        Returns:
+            PriceProvider: configured provider
+        """
+        return cls()
+
+    def get_handle(self, ticker: str):
+        """ Gets a handle that can be shared by get_info, get_history and get_news
+            calls for the same ticker in place of the ticker itself
+
+        Args:
+            ticker (str): ticker of the stock
+
+        Returns:
+            handle of the ticker
+        """
+        return ticker
+
+    @abstractmethod
+    def get_info(self, ticker: str) -> dict:
+        """ Gets the raw info dictionary of a ticker (yfinance Ticker.info keys)
+
+        Args:
+            ticker (str): ticker of the stock
+
+        Returns:
+            dict: raw stock information
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_history(self, ticker: str, period='5y', start=None) -> pd.DataFrame:
+        """ Gets the daily bars of a ticker
+
+        Args:
+            ticker (str): ticker of the stock
+            period (str, optional): time period for history. Defaults to '5y'.
+            start (datetime.date, optional): first date to fetch, overrides period. Defaults to None.
+
+        Returns:
+            pd.DataFrame: Open, High, Low, Close columns indexed by date
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_news(self, ticker: str) -> List[dict]:
+        """ Gets the raw news articles of a ticker (yfinance Ticker.news shape)
+
+        Args:
+            ticker (str): ticker of the stock
+
+        Returns:
+            list: raw news articles
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_quotes(self, tickers: list) -> Dict[str, Dict[str, float]]:
+        """ Gets the current price, previous close and opening price of a list of tickers
+            Prices that could not be fetched are None
+
+        Args:
+            tickers (list): list of tickers
+
+        Returns:
+            dict: current price, previous close, and opening price of each ticker
+        """
+        raise NotImplementedError
+
+
+class YahooPriceProvider(PriceProvider):
+    """ Live market data from Yahoo Finance
+    """
+    name = 'yahoo'
+
+    def __init__(self, bulk=False, chunk_size=200):
+        self.bulk = bulk
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'YahooPriceProvider':
+        return cls(
+            bulk=config.get('STOCK_PRICE_BULK', False),
+            chunk_size=config.get('STOCK_PRICE_CHUNK_SIZE', 200)
+        )
+
+    def get_handle(self, ticker: str) -> yf.Ticker:
+        return yf.Ticker(ticker)
+
+    def _ticker(self, ticker) -> yf.Ticker:
+        return ticker if isinstance(ticker, yf.Ticker) else yf.Ticker(ticker)
+
+    def get_info(self, ticker: str) -> dict:
+        return self._ticker(ticker).info
+
+    def get_history(self, ticker: str, period='5y', start=None) -> pd.DataFrame:
+        if start is not None:
+            return self._ticker(ticker).history(start=start)
+        
+        return self._ticker(ticker).history(period=period)
+
+    def get_news(self, ticker: str) -> List[dict]:
+        return self._ticker(ticker).news
+
+    def get_quotes(self, tickers: list) -> Dict[str, Dict[str, float]]:
+        if self.bulk:
+            return self.get_bulk_quotes(tickers)
+
+        price_data = yf.Tickers(tickers).tickers
+        data = {}
+        for ticker in tickers:
+            try:
+                stock_info = price_data[ticker].info
+                data[ticker] = {
+                    'curr_price': stock_info.get('currentPrice', None),
+                    'prev_close': stock_info.get('previousClose', None),
+                    'open_price': stock_info.get('open', None)
+                }
+            except Exception as e:
+                data[ticker] = {
+                    'curr_price': None,
+                    'prev_close': None,
+                    'open_price': None
+                }
+
+        return data
+
+    def get_bulk_quotes(self, tickers: list) -> Dict[str, Dict[str, float]]:
+        """ Gets quotes using batched requests
+            Tickers are split into chunks and each chunk is fetched in a single request
+
+        Args:
+            tickers (list): list of tickers
+
+        Returns:
+            dict: current price, previous close, and opening price of each ticker
+        """
+        data = {}
+
+        for i in range(0, len(tickers), self.chunk_size):
+            chunk = tickers[i:i+self.chunk_size]
+
+            try:
+                quotes = YfData().get_raw_json(
+                    f'{_QUERY1_URL_}/v7/finance/quote',
+                    params={'symbols': ','.join(chunk), 'formatted': 'false'}
+                )
+                quotes = {q['symbol']: q for q in quotes['quoteResponse']['result']}
+            except Exception as e:
+                quotes = {}
+
+            for ticker in chunk:
+                quote = quotes.get(ticker, {})
+                data[ticker] = {
+                    'curr_price': quote.get('regularMarketPrice', None),
+                    'prev_close': quote.get('regularMarketPreviousClose', None),
+                    'open_price': quote.get('regularMarketOpen', None)
+                }
+
+        return data
+
+
+class SyntheticPriceProvider(PriceProvider):
+    """ Deterministic offline market data for load testing
+        Every ticker exists, has fixed metadata and a seeded random walk price.
+        Each call to get_quotes advances the walk of the requested tickers by one step.
+    """
+    name = 'synthetic'
+    sectors = ['Technology', 'Healthcare', 'Financial Services', 'Energy', 'Industrials', 'Consumer Cyclical']
+
+    def __init__(self, seed=0, volatility=0.002):
+        self.seed = seed
+        self.volatility = volatility
+        self._steps = {}
+        self._prices = {}
+        self._lock = Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'SyntheticPriceProvider':
+        return cls(
+            seed=config.get('SYNTHETIC_PRICE_SEED', 0),
+            volatility=config.get('SYNTHETIC_PRICE_VOLATILITY', 0.002)
+        )
+
+    def _rng(self, *key) -> random.Random:
+        return random.Random(':'.join(str(k) for k in (self.seed, *key)))
+
+    def _open_price(self, ticker: str) -> float:
+        return round(self._rng(ticker).uniform(10, 500), 2)
+
+    def _prev_close(self, ticker: str) -> float:
+        return round(self._open_price(ticker) * (1 + self._rng(ticker, 'close').gauss(0, 0.01)), 2)
+
+    def _current_price(self, ticker: str) -> float:
+        return self._prices.get(ticker, self._open_price(ticker))
+
+    def _step(self, ticker: str) -> float:
+        step = self._steps.get(ticker, 0) + 1
+        price = self._current_price(ticker) * math.exp(self._rng(ticker, step).gauss(0, self.volatility))
+
+        self._steps[ticker] = step
+        self._prices[ticker] = round(price, 2)
+
+        return self._prices[ticker]
+
+    def get_info(self, ticker: str) -> dict:
+        rng = self._rng(ticker, 'info')
+        price = self._current_price(ticker)
+
+        return {
+            'currentPrice': price,
+            'open': self._open_price(ticker),
+            'previousClose': self._prev_close(ticker),
+            'longName': f'{ticker} Synthetic Corp.',
+            'sector': rng.choice(self.sectors),
+            'industry': 'Synthetic',
+            'longBusinessSummary': f'Synthetic company generated for {ticker}.',
+            'currency': 'USD',
+            '52WeekChange': rng.uniform(-0.5, 0.5),
+            'fiftyTwoWeekHigh': round(price * rng.uniform(1, 1.5), 2),
+            'fiftyTwoWeekLow': round(price * rng.uniform(0.5, 1), 2)
+        }
+
+    def get_history(self, ticker: str, period='5y', start=None) -> pd.DataFrame:
+        end = get_est_time().date()
+        # always walk from the same origin so overlapping requests return the same bars
+        dates = pd.bdate_range(get_period_start('10y', end), end)
+        rng = self._rng(ticker, 'history')
+
+        # walk backwards from the previous close so the history lines up with the quotes
+        closes = [self._prev_close(ticker)]
+        for _ in range(len(dates) - 1):
+            closes.append(closes[-1] / math.exp(rng.gauss(0, 0.02)))
+        closes = closes[::-1]
+        opens = [c * math.exp(rng.gauss(0, 0.005)) for c in closes]
+
+        history = pd.DataFrame({
+            'Open': opens,
+            'High': [max(o, c) * (1 + abs(rng.gauss(0, 0.005))) for o, c in zip(opens, closes)],
+            'Low': [min(o, c) * (1 - abs(rng.gauss(0, 0.005))) for o, c in zip(opens, closes)],
+            'Close': closes
+        }, index=dates)
+        
+        start = start if start is not None else get_period_start(period, end)
+        
+        return history[history.index >= pd.Timestamp(start)]
+
+    def get_news(self, ticker: str) -> List[dict]:
+        return [
+            {'content': {'title': f'{ticker} reports synthetic earnings', 'canonicalUrl': {'url': ''}}},
+            {'content': {'title': f'Analysts review {ticker}', 'canonicalUrl': {'url': ''}}}
+        ]
+
+    def get_quotes(self, tickers: list) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                ticker: {
+                    'curr_price': self._step(ticker),
+                    'prev_close': self._prev_close(ticker),
+                    'open_price': self._open_price(ticker)
+                }
+                for ticker in tickers
+            }
+
+
+class RecordingPriceProvider(PriceProvider):
+    """ Wraps another provider and appends every response to JSON lines files
+        (info.jsonl, history.jsonl, news.jsonl, quotes.jsonl) so they can be served by ReplayPriceProvider
+    """
+    name = 'recording'
+
+    def __init__(self, provider: PriceProvider, directory: str):
+        self.provider = provider
+        self.directory = directory
+        self._lock = Lock()
+        
+        os.makedirs(directory, exist_ok=True)
+
+    def _record(self, kind: str, key, data) -> None:
+        line = json.dumps({'t': time.time(), 'key': key, 'data': data}, default=str)
+        
+        with self._lock:
+            with open(os.path.join(self.directory, f'{kind}.jsonl'), 'a') as f:
+                f.write(line + '\n')
+
+    def get_handle(self, ticker: str):
+        return self.provider.get_handle(ticker)
+
+    def get_info(self, ticker) -> dict:
+        info = self.provider.get_info(ticker)
+        self._record('info', _ticker_name(ticker), info)
+        
+        return info
+
+    def get_history(self, ticker, period='5y', start=None) -> pd.DataFrame:
+        history = self.provider.get_history(ticker, period, start)
+        self._record('history', _ticker_name(ticker), {
+            'index': [d.strftime('%Y-%m-%d') for d in history.index],
+            **{column: history[column].tolist() for column in ['Open', 'High', 'Low', 'Close']}
+        })
+        
+        return history
+
+    def get_news(self, ticker) -> List[dict]:
+        news = self.provider.get_news(ticker)
+        self._record('news', _ticker_name(ticker), news)
+        
+        return news
+
+    def get_quotes(self, tickers: list) -> Dict[str, Dict[str, float]]:
+        quotes = self.provider.get_quotes(tickers)
+        self._record('quotes', None, quotes)
+        
+        return quotes
+
+
+class ReplayPriceProvider(PriceProvider):
+    """ Serves responses captured by RecordingPriceProvider from disk
+        The replay clock starts at the first recorded response and runs at speed times wall-clock.
+        With speed 0 the clock only moves through advance(), for stepping through ticks in benchmarks.
+        Each request is answered with the latest response recorded at or before the replay clock.
+    """
+    name = 'replay'
+
+    def __init__(self, directory: str, speed=1.0):
+        self.directory = directory
+        self.speed = speed
+        self._recordings = {kind: self._load(kind) for kind in ['info', 'history', 'news']}
+        self._quotes = self._load_quotes()
+        
+        starts = [times[0] for times, _ in [*self._quotes.values(), *self._recordings['info'].values()]]
+        self._origin = min(starts, default=0.0)
+        self._offset = 0.0
+        self._started = time.monotonic()
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'ReplayPriceProvider':
+        return cls(
+            directory=config.get('MARKET_DATA_DIR', 'market_data'),
+            speed=config.get('MARKET_DATA_REPLAY_SPEED', 1.0)
+        )
+
+    def _read(self, kind: str) -> list:
+        path = os.path.join(self.directory, f'{kind}.jsonl')
+        if not os.path.exists(path):
+            return []
+        
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _load(self, kind: str) -> dict:
+        recordings = {}
+        for record in self._read(kind):
+            times, data = recordings.setdefault(record['key'], ([], []))
+            times.append(record['t'])
+            data.append(record['data'])
+            
+        return recordings
+
+    def _load_quotes(self) -> dict:
+        quotes = {}
+        for record in self._read('quotes'):
+            for ticker, quote in record['data'].items():
+                times, data = quotes.setdefault(ticker, ([], []))
+                times.append(record['t'])
+                data.append(quote)
+                
+        return quotes
+
+    def now(self) -> float:
+        """ Gets the current time of the replay clock
+
+        Returns:
+            float: unix time in the recording
+        """
+        return self._origin + self._offset + (time.monotonic() - self._started) * self.speed
+
+    def advance(self, seconds: float) -> None:
+        """ Moves the replay clock forward
+
+        Args:
+            seconds (float): recorded seconds to skip
+        """
+        self._offset += seconds
+
+    def rewind(self) -> None:
+        """ Moves the replay clock back to the start of the recording
+        """
+        self._offset = 0.0
+        self._started = time.monotonic()
+
+    def _at(self, timeline: tuple):
+        times, data = timeline
+        
+        return data[max(bisect_right(times, self.now()) - 1, 0)]
+
+    def _get(self, kind: str, ticker):
+        timeline = self._recordings[kind].get(_ticker_name(ticker))
+        
+        if timeline is None:
+            raise Exception(f'No recorded {kind} for {_ticker_name(ticker)}')
+        
+        return self._at(timeline)
+
+    def get_info(self, ticker) -> dict:
+        return self._get('info', ticker)
+
+    def get_history(self, ticker, period='5y', start=None) -> pd.DataFrame:
+        history = self._get('history', ticker)
+        history = pd.DataFrame(
+            {column: history[column] for column in ['Open', 'High', 'Low', 'Close']},
+            index=pd.to_datetime(history['index'])
+        )
+        start = start if start is not None else get_period_start(period)
+        
+        return history[history.index >= pd.Timestamp(start)]
+
+    def get_news(self, ticker) -> List[dict]:
+        return self._get('news', ticker)
+
+    def get_quotes(self, tickers: list) -> Dict[str, Dict[str, float]]:
+        empty = {'curr_price': None, 'prev_close': None, 'open_price': None}
+        
+        return {
+            ticker: self._at(self._quotes[ticker]) if ticker in self._quotes else empty
+            for ticker in tickers
+        }
+
+
+def _ticker_name(ticker) -> str:
+    # handles from get_handle (e.g. yf.Ticker) carry their symbol
+    return getattr(ticker, 'ticker', ticker)
+
+
+PRICE_PROVIDERS = {
+    YahooPriceProvider.name: YahooPriceProvider,
+    SyntheticPriceProvider.name: SyntheticPriceProvider,
+    ReplayPriceProvider.name: ReplayPriceProvider,
+}
+
+_providers = {}
+
+
+def get_price_provider() -> PriceProvider:
+    """ Gets the market data provider selected by the PRICE_PROVIDER config
+        If MARKET_DATA_RECORD is set, responses are also recorded to MARKET_DATA_DIR.
+        Providers are created once per process and reused
+
+    Raises:
+        Exception: unknown provider
+
+    Returns:
+        PriceProvider: market data provider
+    """
+    config = current_app.config if has_app_context() else {}
+    name = config.get('PRICE_PROVIDER', YahooPriceProvider.name)
+
+    if name not in _providers:
+        if name not in PRICE_PROVIDERS:
+            raise Exception(f'Unknown price provider: {name}')
+        provider = PRICE_PROVIDERS[name].from_config(config)
+        
+        if config.get('MARKET_DATA_RECORD', False):
+            provider = RecordingPriceProvider(provider, config.get('MARKET_DATA_DIR', 'market_data'))
+            
+        _providers.setdefault(name, provider)
+
+    return _providers[name]
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, cast, delete, func, insert, select
+
+from src.data_models import db, PriceTick
+from .time import get_est_time, utc_to_est
+
+
+def record_price_ticks(prices: dict, timestamp: datetime) -> None:
+    """ Adds the prices used in a refresh to the price tick table with one bulk insert
+        Does not commit, the ticks are committed with the refreshed prices
+
+    Args:
+        prices (dict): current price of each stock id
+        timestamp (datetime): time of the refresh
+    """
+    rows = [
+        {'stock_id': stock_id, 'timestamp': timestamp, 'price': price}
+        for stock_id, price in prices.items()
+        if price is not None
+    ]
+
+    if rows:
+        db.session.execute(insert(PriceTick), rows)
+
+
+def get_price_ticks(stock_id: int, start: datetime, end: datetime=None) -> dict:
+    """ Gets the recorded prices of a stock for plotting
+
+    Args:
+        stock_id (int): id of the stock
+        start (datetime): start of the period
+        end (datetime, optional): end of the period. Defaults to now.
+
+    Returns:
+        dict: time and price of each tick
+    """
+    if end is None:
+        end = get_est_time()
+
+    ticks = db.session.query(
+        PriceTick.timestamp,
+        PriceTick.price
+    ).filter(
+        PriceTick.stock_id == stock_id,
+        PriceTick.timestamp >= start,
+        PriceTick.timestamp <= end
+    ).order_by(
+        PriceTick.timestamp.asc()
+    ).all()
+
+    return {
+        'x': [utc_to_est(t.timestamp).strftime('%Y-%m-%d %H:%M') for t in ticks],
+        'y': [t.price for t in ticks]
+    }
+
+
+def prune_price_ticks(retention_days=30, full_resolution_days=5, bucket_minutes=30, chunk_size=1000) -> None:
+    """ Applies the price tick retention policy with set-based deletes
+        Ticks older than retention_days are deleted, ticks older than full_resolution_days
+        are downsampled to the first tick of each bucket_minutes window.
+        Rows are deleted in id ranges of chunk_size to keep each statement small.
+
+    Args:
+        retention_days (int, optional): days ticks are kept. Defaults to 30.
+        full_resolution_days (int, optional): days every tick is kept. Defaults to 5.
+        bucket_minutes (int, optional): size of the downsampling window in minutes. Defaults to 30.
+        chunk_size (int, optional): size of the id range deleted per statement. Defaults to 1000.
+    """
+    now = get_est_time()
+    retention_cutoff = now - timedelta(days=retention_days)
+    resolution_cutoff = now - timedelta(days=full_resolution_days)
+
+    # expired ticks
+    for start, end in _id_ranges(PriceTick.timestamp < retention_cutoff, chunk_size):
+        _delete(
+            PriceTick.id >= start,
+            PriceTick.id < end,
+            PriceTick.timestamp < retention_cutoff
+        )
+
+    # downsample old ticks, keeping the first tick of each stock and window
+    # ticks below the current range were already downsampled, and the windows touched by the range 
+    # only hold ticks of its stocks within one window of its first and last tick,
+    # so the first tick of a window is looked up through the (stock_id, timestamp) index
+    bucket = _epoch_seconds(PriceTick.timestamp) // (bucket_minutes * 60)
+    window = timedelta(minutes=bucket_minutes)
+
+    for start, end in _id_ranges(PriceTick.timestamp < resolution_cutoff, chunk_size):
+        in_range = (PriceTick.id >= start, PriceTick.id < end, PriceTick.timestamp < resolution_cutoff)
+        
+        first_tick, last_tick = db.session.query(
+            func.min(PriceTick.timestamp), 
+            func.max(PriceTick.timestamp)
+        ).filter(*in_range).one()
+        
+        if first_tick is None:
+            continue
+        
+        stock_ids = select(PriceTick.stock_id).where(*in_range).distinct()
+        first = select(
+            func.min(PriceTick.id)
+        ).where(
+            PriceTick.stock_id.in_(stock_ids),
+            PriceTick.timestamp >= first_tick - window,
+            PriceTick.timestamp <= last_tick + window,
+            PriceTick.timestamp < resolution_cutoff,
+            PriceTick.id < end
+        ).group_by(
+            PriceTick.stock_id,
+            bucket
+        )
+        _delete(*in_range, PriceTick.id.not_in(first))
+
+
+def _epoch_seconds(column):
+    # unix seconds of a timestamp column in SQL
+    if db.engine.dialect.name == 'sqlite':
+        return cast(func.strftime('%s', column), Integer)
+    
+    return func.extract('epoch', column)
+
+
+def _id_ranges(condition, chunk_size: int) -> list:
+    # [start, end) id ranges covering the rows that match the condition
+    low, high = db.session.query(func.min(PriceTick.id), func.max(PriceTick.id)).filter(condition).one()
+    
+    if low is None:
+        return []
+
+    return [(start, min(start + chunk_size, high + 1)) for start in range(low, high + 1, chunk_size)]
+
+
+def _delete(*conditions) -> None:
+    db.session.execute(delete(PriceTick).where(*conditions).execution_options(synchronize_session=False))
+    db.session.commit()
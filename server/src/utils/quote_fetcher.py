@@ -0,0 +1,192 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from .price_provider import PriceProvider
+
+
+@dataclass
+class FetchSummary:
+    """ Summary of a concurrent quote fetch
+    """
+    tickers: int = 0
+    batches: int = 0
+    attempts: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    failed: List[str] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def max_latency(self) -> float:
+        return max(self.latencies, default=0.0)
+
+    @property
+    def median_latency(self) -> float:
+        latencies = sorted(self.latencies)
+        return latencies[len(latencies) // 2] if latencies else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'tickers': self.tickers,
+            'batches': self.batches,
+            'attempts': self.attempts,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'failed': len(self.failed),
+            'median_latency': round(self.median_latency, 3),
+            'max_latency': round(self.max_latency, 3),
+            'duration': round(self.duration, 3)
+        }
+
+
+class _Job:
+    def __init__(self, tickers: list, attempt=0, not_before=0.0):
+        self.tickers = tickers
+        self.attempt = attempt
+        self.not_before = not_before
+        self.started = None
+
+
+def _empty_quote() -> Dict[str, float]:
+    return {'curr_price': None, 'prev_close': None, 'open_price': None}
+
+
+def fetch_quotes(
+    provider: PriceProvider,
+    tickers: list,
+    workers=8,
+    batch_size=200,
+    timeout=15.0,
+    retries=2,
+    backoff=0.5,
+    on_quotes: Callable = None
+) -> tuple:
+    """ Fetches quotes for a list of tickers in concurrent batches
+        Batches that raise, time out or return missing prices are retried with jittered exponential backoff.
+        A batch that hangs past its deadline is abandoned and its thread left behind in a replaced worker pool, 
+        so the fetch is bounded by the slowest batch and later batches are not stuck behind hung calls.
+        The deadline applies to each batch attempt, not to each ticker: the tickers of a batch are priced 
+        by one provider request and share its deadline, so a batch_size of 1 gives every ticker its own deadline.
+
+    Args:
+        provider (PriceProvider): market data provider
+        tickers (list): list of tickers
+        workers (int, optional): max number of batches in flight. Defaults to 8.
+        batch_size (int, optional): max number of tickers per batch. Defaults to 200.
+        timeout (float, optional): deadline in seconds for each batch attempt, shared by its tickers. Defaults to 15.0.
+        retries (int, optional): max number of retries per ticker. Defaults to 2.
+        backoff (float, optional): base delay in seconds between retries. Defaults to 0.5.
+        on_quotes (Callable, optional): called in this thread with the priced quotes of each batch as it arrives,
+            while other batches are still in flight. If it raises, the batch is counted as an error and retried. 
+            Defaults to None.
+
+    Returns:
+        tuple: quotes of each ticker (same shape as PriceProvider.get_quotes) and a FetchSummary
+    """
+    start = time.monotonic()
+    summary = FetchSummary(tickers=len(tickers))
+    data = {ticker: _empty_quote() for ticker in tickers}
+
+    queue = [_Job(tickers[i:i+batch_size]) for i in range(0, len(tickers), batch_size)]
+    summary.batches = len(queue)
+    running = {}
+
+    def retry(job: _Job, missing: list) -> None:
+        if job.attempt < retries:
+            delay = backoff * (2 ** job.attempt) * random.uniform(0.5, 1.5)
+            queue.append(_Job(missing, job.attempt + 1, time.monotonic() + delay))
+            summary.retries += len(missing)
+        else:
+            summary.failed.extend(missing)
+
+    def call(job: _Job) -> dict:
+        # the deadline starts when a worker picks up the batch
+        job.started = time.monotonic()
+        return provider.get_quotes(job.tickers)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while queue or running:
+            now = time.monotonic()
+
+            # start jobs that are ready while there is capacity
+            for job in sorted(queue, key=lambda j: j.not_before):
+                if len(running) >= workers or job.not_before > now:
+                    break
+                queue.remove(job)
+                job.started = now
+                running[executor.submit(call, job)] = job
+                summary.attempts += 1
+
+            if not running:
+                time.sleep(max(0.0, min(j.not_before for j in queue) - now))
+                continue
+
+            # wait for the next completion, deadline, or retry
+            wake = min(job.started + timeout for job in running.values())
+            if queue:
+                wake = min(wake, min(j.not_before for j in queue))
+            done, _ = wait(running, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+
+            for future in done:
+                job = running.pop(future)
+                summary.latencies.append(now - job.started)
+                try:
+                    quotes = future.result()
+                except Exception as e:
+                    summary.errors += 1
+                    retry(job, job.tickers)
+                    continue
+
+                missing = []
+                arrived = {}
+                for ticker in job.tickers:
+                    quote = quotes.get(ticker)
+                    if quote is None or quote.get('curr_price') is None:
+                        missing.append(ticker)
+                    else:
+                        data[ticker] = arrived[ticker] = quote
+                if missing:
+                    retry(job, missing)
+                if arrived and on_quotes is not None:
+                    try:
+                        on_quotes(arrived)
+                    except Exception as e:
+                        # the batch was not applied, fetch it again
+                        summary.errors += 1
+                        for ticker in arrived:
+                            data[ticker] = _empty_quote()
+                        retry(job, list(arrived))
+
+            # the callbacks may have taken a while
+            now = time.monotonic()
+
+            # abandon batches past their deadline
+            abandoned = False
+            for future, job in list(running.items()):
+                if now - job.started >= timeout:
+                    running.pop(future)
+                    future.cancel()
+                    summary.timeouts += 1
+                    summary.latencies.append(now - job.started)
+                    retry(job, job.tickers)
+                    abandoned = True
+            
+            # the threads of abandoned batches stay busy until their call returns,
+            # later batches run on a new pool while the old one finishes the batches it started
+            if abandoned:
+                executor.shutdown(wait=False)
+                executor = ThreadPoolExecutor(max_workers=workers)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    summary.duration = time.monotonic() - start
+
+    return data, summary
@@ -1,21 +1,48 @@
-from ..data_models import db, Stock, DailyHistory, ClosingHistory, Portfolio, Game, Order
+from flask import current_app
+from sqlalchemy import Date, DateTime, insert, literal, select, union
+
+from ..data_models import db, Stock, DailyHistory, ClosingHistory, Portfolio, Game, Order, Holding
 from .time import get_est_time
-from .math_functions import round_number
-from .order import check_order_expired, check_orders
-from .stock_data import get_stock_prices
+from .order import check_order_expired, check_orders, get_orders_to_check
+from .price_ticks import record_price_ticks, prune_price_ticks
+from .history import archive_daily_history, delete_daily_history
+from .stock_data import fetch_stock_prices
+from .valuation import value_portfolios_orm, value_portfolios_sql, value_portfolios_numpy, rank_portfolios
+from .metrics import track_stage
 
 
 # run periodically when markets are open
 def update_stock_prices() -> None:
-    '''Updates the current, open, previous close price of all stocks in the database
+    '''Updates the current, open, previous close price of stocks in the database
+        only active stocks are updated if REFRESH_ACTIVE_STOCKS_ONLY is set,
+        other stocks are refreshed when they are viewed
         meant to run periodically when markets are open
     '''
-    stocks = Stock.query.all()
+    if current_app.config.get('REFRESH_ACTIVE_STOCKS_ONLY', False):
+        stocks = get_active_stocks()
+    else:
+        stocks = Stock.query.all()
 
     tickers = [stock.ticker for stock in stocks]
-    data = get_stock_prices(tickers)
+    with track_stage('quote_fetch') as stage:
+        data, summary = fetch_stock_prices(tickers)
+        stage.rows = len(tickers) - len(summary.failed)
     update_time = get_est_time()
+    
+    current_app.logger.info(f'stock price refresh: {summary.as_dict()}')
+    if summary.failed:
+        current_app.logger.warning(f'failed to refresh prices for: {", ".join(summary.failed)}')
+
+    with track_stage('price_update') as stage:
+        apply_stock_prices(stocks, data, update_time)
+        db.session.commit()
+        stage.rows = len(stocks)
 
+
+def apply_stock_prices(stocks: list, data: dict, update_time) -> None:
+    '''Sets the fetched prices on Stock objects and records them as price ticks
+        prices that could not be fetched keep their previous value
+    '''
     for stock in stocks:
         prices = data[stock.ticker]
         
@@ -24,61 +51,58 @@ def update_stock_prices() -> None:
         stock.previous_close = prices['prev_close'] if prices['prev_close'] is not None else stock.previous_close
         stock.last_updated = update_time if prices['curr_price'] is not None else stock.last_updated
 
-    db.session.commit()
+    if current_app.config.get('RECORD_PRICE_TICKS', False):
+        record_price_ticks(
+            {stock.id: data[stock.ticker]['curr_price'] for stock in stocks},
+            update_time
+        )
+
+
+def get_active_stocks() -> list:
+    '''Gets the stocks held in portfolios of games that are 'In Progress' and stocks with pending orders
+    '''
+    active_ids = union(
+        select(Holding.stock_id).join(Portfolio).join(Game).where(Game.status == 'In Progress'),
+        select(Order.stock_id).where(Order.order_status == 'pending')
+    )
+
+    return Stock.query.filter(Stock.id.in_(active_ids)).all()
 
 
 def update_portfolios() -> None:
     '''Updates the total value and rankings of all portfolios in games that are 'In Progress'
+        pending orders to check are selected according to ORDER_MATCHING (sql, book or scan)
+        portfolios are valued with one aggregate query if PORTFOLIO_VALUATION is 'sql',
+        or with numpy arrays if it is 'numpy'
     '''
-    portfolios = Portfolio.query.join(Game).filter_by(status='In Progress').all()
     update_time = get_est_time()
     games = Game.query.filter(Game.status == 'In Progress').all()
     
     for game in games:
-        portfolios = game.portfolios
         game.last_updated = update_time
-        
-        # update portfolio values
-        for portfolio in portfolios:
-            # check if any orders can be fulfilled
-            orders = portfolio.orders
-            check_orders(orders)
-            
-            # update portfolio value
-            holdings = portfolio.holdings
-            portfolio_value = portfolio.available_cash
-            
-            for holding in holdings:
-                portfolio_value += (holding.shares_owned * holding.stock.current_price)
-                
-            portfolio.current_value = round_number(portfolio_value)
-            portfolio.day_change = round_number(portfolio.current_value-portfolio.last_close_value)
-            portfolio.last_updated = update_time
-            
-        # update overall rankings
-        prev_rank = 1
-        prev = 0
-        portfolios = sorted(portfolios, key=lambda x: x.current_value, reverse=True)
-        for i, portfolio in enumerate(portfolios):
-            if portfolio.current_value != prev:
-                portfolio.overall_rank = i+1
-                prev = portfolio.current_value
-                prev_rank = i+1
-            else:
-                portfolio.overall_rank = prev_rank
-                
-        # update daily rankings
-        prev_rank = 1
-        prev = 0
-        portfolios = sorted(portfolios, key=lambda x: x.day_change, reverse=True)
-        for i, portfolio in enumerate(portfolios):
-            if portfolio.day_change != prev:
-                portfolio.daily_rank = i+1
-                prev = portfolio.day_change
-                prev_rank = i+1
-            else:
-                portfolio.daily_rank = prev_rank
-            
+    
+    # check if any orders can be fulfilled
+    with track_stage('order_matching') as stage:
+        orders = get_orders_to_check()
+        check_orders(orders)
+        stage.rows = len(orders)
+    
+    # update portfolio values and rankings
+    valuation = current_app.config.get('PORTFOLIO_VALUATION', 'orm')
+    
+    with track_stage('valuation') as stage:
+        if valuation == 'numpy':
+            stage.rows = value_portfolios_numpy(update_time)
+        elif valuation == 'sql':
+            stage.rows = value_portfolios_sql(update_time)
+        else:
+            value_portfolios_orm(games, update_time)
+            stage.rows = sum(len(game.portfolios) for game in games)
+    
+    if valuation != 'numpy':
+        with track_stage('ranking') as stage:
+            stage.rows = rank_portfolios()
+    
     db.session.commit()
 
 
@@ -86,22 +110,23 @@ def save_daily_history() -> None:
     '''Saves value of all portfolios that are in a game that is 'In Progress'
         meant to run periodically when stock markets are open
     '''
-    portfolios = Portfolio.query.join(Game).filter_by(status='In Progress').all()
-
     record_time = get_est_time()
     record_date = record_time.date()
 
-    for portfolio in portfolios:
-        history = DailyHistory(
-            portfolio_id=portfolio.id, 
-            date=record_date, 
-            portfolio_value=portfolio.current_value, 
-            update_time=record_time
-        )
-
-        db.session.add(history)
+    with track_stage('history') as stage:
+        stage.rows = db.session.execute(
+            insert(DailyHistory).from_select(
+                ['portfolio_id', 'date', 'update_time', 'portfolio_value'],
+                select(
+                    Portfolio.id,
+                    literal(record_date, Date),
+                    literal(record_time, DateTime(timezone=True)),
+                    Portfolio.current_value
+                ).join(Game).where(Game.status == 'In Progress')
+            )
+        ).rowcount
 
-    db.session.commit()
+        db.session.commit()
 
 
 # run at the end of the trading day
@@ -109,37 +134,46 @@ def save_closing_history() -> None:
     '''Saves the closing value of all portfolios that are in a game that is 'In Progress'
         meant to run at the end of the trading day
     '''
-    portfolios = Portfolio.query.join(Game).filter_by(status='In Progress').all()
-
     record_date = get_est_time().date()
 
-    for portfolio in portfolios:
-        history = ClosingHistory(portfolio_id=portfolio.id, date=record_date, portfolio_value=portfolio.current_value)
-
-        db.session.add(history)
-
-    db.session.commit()
+    with track_stage('closing_history') as stage:
+        stage.rows = db.session.execute(
+            insert(ClosingHistory).from_select(
+                ['portfolio_id', 'date', 'portfolio_value'],
+                select(
+                    Portfolio.id,
+                    literal(record_date, Date),
+                    Portfolio.current_value
+                ).join(Game).where(Game.status == 'In Progress')
+            )
+        ).rowcount
+
+        db.session.commit()
     
 
 def update_completed_games() -> None:
     '''Updates the status of games to 'completed' if the end date has passed
     '''
-    games = Game.query.filter_by(status='In Progress').all()
+    with track_stage('completed_games') as stage:
+        games = Game.query.filter_by(status='In Progress').all()
 
-    current_date = get_est_time().date()
+        current_date = get_est_time().date()
 
-    for game in games:
-        if game.end_date is not None and game.end_date < current_date:
-            game.status = 'Completed'
-    
-    db.session.commit()
+        for game in games:
+            if game.end_date is not None and game.end_date < current_date:
+                game.status = 'Completed'
+        
+        stage.rows = sum(game.status == 'Completed' for game in games)
+        db.session.commit()
 
 
 def close_expired_orders() -> None:
     '''Closes all orders that have expired
     '''
-    orders = Order.query.filter_by(order_status='pending').all()
-    check_order_expired(orders)
+    with track_stage('order_expiry') as stage:
+        orders = Order.query.filter_by(order_status='pending').all()
+        check_order_expired(orders)
+        stage.rows = sum(order.order_status == 'expired' for order in orders)
 
 
 # run right before market opens
@@ -147,32 +181,53 @@ def update_last_close_value() -> None:
     '''Updates the last close value of all portfolios in games that are 'In Progress'
         meant to run at the start of the trading day
     '''
-    portfolios = Portfolio.query.join(Game).filter_by(status='In Progress').all()
+    with track_stage('last_close_value') as stage:
+        portfolios = Portfolio.query.join(Game).filter_by(status='In Progress').all()
 
-    for portfolio in portfolios:
-        portfolio.last_close_value = portfolio.current_value
+        for portfolio in portfolios:
+            portfolio.last_close_value = portfolio.current_value
 
-    db.session.commit()
+        stage.rows = len(portfolios)
+        db.session.commit()
 
 
 def update_started_games() -> None:
     '''Updates the status of games to 'In Progress' if the start date has passed
     '''
-    games = Game.query.filter_by(status='Not Started').all()
+    with track_stage('started_games') as stage:
+        games = Game.query.filter_by(status='Not Started').all()
 
-    current_date = get_est_time().date()
+        current_date = get_est_time().date()
 
-    for game in games:
-        if game.start_date <= current_date:
-            game.status = 'In Progress'
+        for game in games:
+            if game.start_date <= current_date:
+                game.status = 'In Progress'
 
-    db.session.commit()
+        stage.rows = sum(game.status == 'In Progress' for game in games)
+        db.session.commit()
     
 
 def drop_prev_day_data() -> None:
-    '''Deletes all daily history data before today
+    '''Removes daily history data before today from the daily history table
+        previous days are kept as one compact archive row per portfolio and day if ARCHIVE_DAILY_HISTORY is set,
+        raw rows are deleted in chunks of HISTORY_DELETE_CHUNK_SIZE
     '''
     date = get_est_time().date()
-    DailyHistory.query.filter(DailyHistory.date < date).delete()
+    chunk_size = current_app.config.get('HISTORY_DELETE_CHUNK_SIZE', 1000)
+    
+    with track_stage('history_cleanup') as stage:
+        if current_app.config.get('ARCHIVE_DAILY_HISTORY', False):
+            stage.rows = archive_daily_history(date, chunk_size)
+        else:
+            stage.rows = delete_daily_history(date, chunk_size)
+
 
-    db.session.commit()
\ No newline at end of file
+def drop_old_price_ticks() -> None:
+    '''Applies the retention and downsampling policy to the price tick table
+    '''
+    with track_stage('price_tick_cleanup'):
+        prune_price_ticks(
+            retention_days=current_app.config.get('PRICE_TICK_RETENTION_DAYS', 30),
+            full_resolution_days=current_app.config.get('PRICE_TICK_FULL_RESOLUTION_DAYS', 5),
+            bucket_minutes=current_app.config.get('PRICE_TICK_DOWNSAMPLE_MINUTES', 30)
+        )
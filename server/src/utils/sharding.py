@@ -0,0 +1,197 @@
+import heapq
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from flask import Flask, current_app
+from sqlalchemy import func, select
+
+from src.data_models import db, Game, Portfolio
+from .scheduler import update_stock_prices, save_daily_history
+from .pipeline import load_tick_snapshot, match_orders, value_snapshot
+from .metrics import StageMetric, track_stage, record_stage
+
+
+@dataclass
+class ShardResult:
+    """ Work done by one shard of the periodic tick
+    """
+    shard: int
+    games: int = 0
+    portfolios: int = 0
+    orders: int = 0
+    filled: int = 0
+    statements: int = 0
+    duration: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'shard': self.shard,
+            'games': self.games,
+            'portfolios': self.portfolios,
+            'orders': self.orders,
+            'filled': self.filled,
+            'statements': self.statements,
+            'duration': round(self.duration, 3)
+        }
+
+
+_pool = None
+_pool_workers = 0
+
+# app of a shard worker process, created by _init_shard_worker
+_shard_app = None
+
+
+def partition_games(game_sizes: list, shards: int) -> list:
+    """ Splits games into shards of roughly equal work
+        Games are assigned from largest to smallest to the shard with the fewest portfolios so far
+
+    Args:
+        game_sizes (list): (game id, number of portfolios) of each game
+        shards (int): number of shards
+
+    Returns:
+        list: list of game ids of each shard, empty shards are left out
+    """
+    heap = [(0, shard, []) for shard in range(max(shards, 1))]
+    
+    for game_id, size in sorted(game_sizes, key=lambda game: -game[1]):
+        load, shard, game_ids = heapq.heappop(heap)
+        game_ids.append(game_id)
+        heapq.heappush(heap, (load + max(size, 1), shard, game_ids))
+    
+    return [game_ids for _, _, game_ids in sorted(heap, key=lambda entry: entry[1]) if game_ids]
+
+
+def get_shard_pool(workers: int) -> ProcessPoolExecutor:
+    """ Gets the process pool that runs shards, started once and reused across ticks
+        Worker processes are spawned, so none of them inherit the parent's database connections
+
+    Args:
+        workers (int): number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: process pool
+    """
+    global _pool, _pool_workers
+    
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            
+        config = {key: value for key, value in current_app.config.items() if key.isupper()}
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_shard_worker,
+            initargs=(config,)
+        )
+        _pool_workers = workers
+        
+    return _pool
+
+
+def shutdown_shard_pool() -> None:
+    """ Stops the worker processes of the shard pool
+    """
+    global _pool
+    
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def run_sharded_tick(workers: int) -> list:
+    """ Runs the periodic job with 'In Progress' games partitioned across a process pool
+        Prices are refreshed once in this process, then each worker process checks orders, 
+        values and ranks the portfolios of its shard of games with its own database session,
+        using the PORTFOLIO_VALUATION engine restricted to the shard's games
+
+    Args:
+        workers (int): number of worker processes
+
+    Returns:
+        list: ShardResult of each shard
+    """
+    update_stock_prices()
+    
+    game_sizes = db.session.execute(
+        select(
+            Game.id,
+            func.count(Portfolio.id)
+        ).outerjoin(
+            Portfolio, Portfolio.game_id == Game.id
+        ).where(
+            Game.status == 'In Progress'
+        ).group_by(
+            Game.id
+        )
+    ).all()
+    
+    # release the connection while the shards run
+    db.session.commit()
+    
+    shards = partition_games(game_sizes, workers)
+    pool = get_shard_pool(workers)
+    
+    with track_stage('shards') as stage:
+        try:
+            futures = [pool.submit(_run_shard, shard, game_ids) for shard, game_ids in enumerate(shards)]
+            results = [future.result() for future in futures]
+        except Exception as e:
+            # a crashed worker breaks the pool, start a new one next tick
+            shutdown_shard_pool()
+            raise e
+        stage.rows = sum(result.portfolios for result in results)
+    
+    for result in results:
+        current_app.logger.info(f'tick shard: {result.as_dict()}')
+        record_stage(StageMetric(
+            stage=f'shard_{result.shard}',
+            started_at=stage.started_at,
+            duration=result.duration,
+            rows=result.portfolios,
+            statements=result.statements
+        ))
+    
+    save_daily_history()
+    
+    return results
+
+
+def _init_shard_worker(config: dict) -> None:
+    global _shard_app
+    
+    _shard_app = Flask(__name__)
+    _shard_app.config.update(config)
+    db.init_app(_shard_app)
+
+
+def _run_shard(shard: int, game_ids: list) -> ShardResult:
+    start = time.perf_counter()
+    
+    with _shard_app.app_context(), track_stage('shard') as stage:
+        try:
+            snapshot = load_tick_snapshot(game_ids)
+            checked = match_orders(snapshot)
+            
+            for game in snapshot.games:
+                game.last_updated = snapshot.update_time
+            
+            value_snapshot(snapshot)
+            
+            db.session.commit()
+        finally:
+            db.session.remove()
+    
+    return ShardResult(
+        shard=shard,
+        games=len(snapshot.games),
+        portfolios=snapshot.portfolio_count,
+        orders=checked,
+        filled=checked - len(snapshot.orders),
+        statements=stage.statements,
+        duration=time.perf_counter() - start
+    )
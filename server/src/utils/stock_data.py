@@ -1,14 +1,60 @@
-from typing import List, Dict
-import yfinance as yf
+from datetime import datetime
+from functools import partial
+from typing import Callable, List, Dict
+from flask import current_app, has_app_context
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
 
+from ..data_models import db, StockHistory, StockHistoryCoverage
+from .cache import TTLCache
+from .concurrency import SingleFlight, fan_out, with_app_context
 from .math_functions import round_number
+from .price_provider import get_price_provider
+from .quote_fetcher import fetch_quotes
+from .transaction import add_stock
+from .time import get_est_time, get_next_market_close, get_period_start, get_prev_market_date, check_market_closed
 
 
-def get_stock_info(ticker: str) -> Dict[str, str]:
+_stock_caches = {}
+_synced_stocks = {} # ticker -> (stock info last written, stock id)
+_stock_flight = SingleFlight()
+
+NO_NEWS = [{'name': 'No news available', 'url': ''}]
+
+
+def get_stock_cache(kind: str) -> TTLCache:
+    """ Gets the cache for a kind of stock data (info, news, history)
+        Sizes and TTLs are set by the STOCK_CACHE_* config, 
+        STOCK_<KIND>_STALE_WHILE_REVALIDATE overrides STOCK_CACHE_STALE_WHILE_REVALIDATE for one kind
+
+    Args:
+        kind (str): kind of stock data
+
+    Returns:
+        TTLCache: cache for the data
+    """
+    if kind not in _stock_caches:
+        config = current_app.config if has_app_context() else {}
+        
+        _stock_caches.setdefault(kind, TTLCache(
+            maxsize=config.get('STOCK_CACHE_SIZE', 1024),
+            ttl=config.get(f'STOCK_{kind.upper()}_CACHE_TTL', 300),
+            stale_while_revalidate=config.get(
+                f'STOCK_{kind.upper()}_STALE_WHILE_REVALIDATE', 
+                config.get('STOCK_CACHE_STALE_WHILE_REVALIDATE', False)
+            )
+        ))
+        
+    return _stock_caches[kind]
+
+
+def get_stock_info(ticker: str, cached=True, handle=None) -> Dict[str, str]:
     """ Gets the stock information for a given ticker
 
     Args:
         ticker (str): ticker of the stock
+        cached (bool, optional): whether to use the info cache. Defaults to True.
+        handle (optional): shared ticker handle from PriceProvider.get_handle. Defaults to None.
 
     Raises:
         Exception: ticker not found
@@ -16,7 +62,13 @@ def get_stock_info(ticker: str) -> Dict[str, str]:
     Returns:
         dict: dictionary of stock information
     """
-    stock_info = yf.Ticker(ticker).info
+    if cached:
+        return get_stock_cache('info').get_or_load(
+            ticker, 
+            with_app_context(partial(get_stock_info, ticker, cached=False, handle=handle))
+        )
+    
+    stock_info = get_price_provider().get_info(handle if handle is not None else ticker)
     
     if 'currentPrice' not in stock_info:
         raise Exception('cannot find ticker')
@@ -34,64 +86,229 @@ def get_stock_info(ticker: str) -> Dict[str, str]:
         '%DayChange': round_number((float(stock_info.get('currentPrice', 0))/float(stock_info.get('open', 1)) - 1)*100),
         '52WeekReturns': round_number(float(stock_info.get('52WeekChange', 0))*100),
         '52WeekHigh': round_number(float(stock_info.get('fiftyTwoWeekHigh', 0))),
-        '52WeekLow': round_number(float(stock_info.get('fiftyTwoWeekLow', 0)))
+        '52WeekLow': round_number(float(stock_info.get('fiftyTwoWeekLow', 0))),
+        'lastUpdated': get_est_time()
     }
         
 
-def get_stock_history(ticker: str, period='5y', detailed=False) -> Dict[str, List[float]]:
+def get_stock_history(ticker: str, period='5y', detailed=False, cached=True, handle=None) -> Dict[str, List[float]]:
     """ Gets the stock history for a given ticker
+        Daily bars are served from the local store, fetching only the missing days.
+        Cached history expires at the next market close
 
     Args:
         ticker (str): ticker of the stock
         period (str, optional): time period for history. Defaults to '5y'.
         detailed (bool, optional): whether want detailed history. Defaults to False.
+        cached (bool, optional): whether to use the history cache. Defaults to True.
+        handle (optional): shared ticker handle from PriceProvider.get_handle. Defaults to None.
 
     Returns:
         dict: dictionary of stock history
     """
-    stock = yf.Ticker(ticker).history(period=period).dropna()
+    if cached:
+        return get_stock_cache('history').get_or_load(
+            (ticker, period, detailed),
+            with_app_context(partial(get_stock_history, ticker, period, detailed, cached=False, handle=handle)),
+            expires_at=lambda: get_next_market_close().timestamp()
+        )
+    
+    start = get_period_start(period)
+    sync_stock_history(ticker, start, handle)
+    
+    bars = db.session.query(
+        StockHistory.date,
+        StockHistory.close_price,
+        StockHistory.open_price,
+        StockHistory.high_price,
+        StockHistory.low_price
+    ).filter(
+        StockHistory.ticker == ticker,
+        StockHistory.date >= start
+    ).order_by(
+        StockHistory.date.asc()
+    ).all()
+    
+    dates, closes, opens, highs, lows = zip(*bars) if bars else ([], [], [], [], [])
+    dates = [d.strftime('%Y-%m-%d') for d in dates]
 
     if detailed:
         history = {
-            'date': [d.strftime('%Y-%m-%d') for d in stock.index],
-            'close': [p for p in round(stock['Close'], 2)],
-            'open': [p for p in round(stock['Open'], 2)],
-            'high': [p for p in round(stock['High'], 2)],
-            'low': [p for p in round(stock['Low'], 2)]
+            'date': dates,
+            'close': [round(p, 2) for p in closes],
+            'open': [round(p, 2) for p in opens],
+            'high': [round(p, 2) for p in highs],
+            'low': [round(p, 2) for p in lows]
         }
     else:
         history = {
-            'x': [d.strftime('%Y-%m-%d') for d in stock.index],
-            'y': [p for p in round(stock['Close'], 2)]
+            'x': dates,
+            'y': [round(p, 2) for p in closes]
         }
 
     return history
 
 
-def get_stock_news(ticker: str) -> List[Dict[str, str]]:
+def sync_stock_history(ticker: str, start: datetime.date, handle=None) -> None:
+    """ Fetches the daily bars of a ticker that are missing from the local store
+        Only the bars since the last stored date are fetched, unless the store does not cover start.
+        The earliest date fetched is stored per ticker, so a period starting before the first listed bar 
+        stays covered across processes and restarts
+
+    Args:
+        ticker (str): ticker of the stock
+        start (datetime.date): first date that needs to be stored
+        handle (optional): shared ticker handle from PriceProvider.get_handle. Defaults to None.
+    """
+    first, last = db.session.query(
+        func.min(StockHistory.date),
+        func.max(StockHistory.date)
+    ).filter(
+        StockHistory.ticker == ticker
+    ).one()
+    
+    coverage = StockHistoryCoverage.query.filter_by(ticker=ticker).first()
+    covered = min(first, coverage.start_date) if first is not None and coverage is not None else first
+    
+    # nothing stored or store starts after the requested period, fetch the whole period
+    if last is None or covered > start:
+        fetch_start = start
+    # last bar is final, nothing to fetch
+    elif last >= get_prev_market_date() and (last < get_est_time().date() or check_market_closed()):
+        return
+    # refetch the last bar in case it was stored while the market was open
+    else:
+        fetch_start = last
+    
+    bars = get_price_provider().get_history(handle if handle is not None else ticker, start=fetch_start).dropna()
+    rows = [
+        {
+            'ticker': ticker,
+            'date': date,
+            'open_price': float(o),
+            'high_price': float(h),
+            'low_price': float(l),
+            'close_price': float(c)
+        }
+        for date, o, h, l, c in zip(bars.index.date, bars['Open'], bars['High'], bars['Low'], bars['Close'])
+    ]
+    
+    try:
+        StockHistory.query.filter(
+            StockHistory.ticker == ticker,
+            StockHistory.date >= fetch_start
+        ).delete()
+        if rows:
+            db.session.execute(insert(StockHistory), rows)
+        
+        if coverage is None:
+            db.session.add(StockHistoryCoverage(ticker=ticker, start_date=fetch_start))
+        else:
+            coverage.start_date = min(fetch_start, covered or fetch_start)
+        
+        db.session.commit()
+    except IntegrityError:
+        # bars were stored by a concurrent request
+        db.session.rollback()
+
+
+def get_stock_news(ticker: str, cached=True, handle=None) -> List[Dict[str, str]]:
     """ Gets the latest news articles for a given stock
 
     Args:
         ticker (str): ticker of the stock
+        cached (bool, optional): whether to use the news cache. Defaults to True.
+        handle (optional): shared ticker handle from PriceProvider.get_handle. Defaults to None.
 
     Returns:
         list: list of news articles
     """
     try:
-        news = yf.Ticker(ticker).news
-        articles = []
-
-        for n in news:
-            articles.append({
-                'name': n['content']['title'],
-                'url': n['content']['canonicalUrl']['url']
-            })
+        # failed fetches raise so they are not cached and the next request tries again
+        if cached:
+            return get_stock_cache('news').get_or_load(
+                ticker, 
+                with_app_context(partial(_fetch_stock_news, ticker, handle))
+            )
+        
+        return _fetch_stock_news(ticker, handle)
     except Exception as e:
-        articles = [{'name': 'No news available', 'url': ''}]
+        return NO_NEWS
+
+
+def _fetch_stock_news(ticker: str, handle=None) -> List[Dict[str, str]]:
+    news = get_price_provider().get_news(handle if handle is not None else ticker)
+    articles = []
+
+    for n in news:
+        articles.append({
+            'name': n['content']['title'],
+            'url': n['content']['canonicalUrl']['url']
+        })
 
     return articles
 
 
+def get_stock_overview(ticker: str, period='1y') -> tuple:
+    """ Gets the info, news and history of a stock concurrently using a shared ticker handle
+        News that is not ready by STOCK_NEWS_TIMEOUT falls back to 'No news available'
+
+    Args:
+        ticker (str): ticker of the stock
+        period (str, optional): time period for history. Defaults to '1y'.
+
+    Raises:
+        Exception: ticker not found
+        TimeoutError: info or history not ready in time
+
+    Returns:
+        tuple: stock info, news articles, and stock history
+    """
+    config = current_app.config if has_app_context() else {}
+    handle = get_price_provider().get_handle(ticker)
+    
+    parts = fan_out(
+        {
+            'info': partial(get_stock_info, ticker, handle=handle),
+            'news': partial(get_stock_news, ticker, handle=handle),
+            'history': partial(get_stock_history, ticker, period, handle=handle)
+        },
+        timeouts={
+            'info': config.get('STOCK_INFO_TIMEOUT', 10),
+            'news': config.get('STOCK_NEWS_TIMEOUT', 3),
+            'history': config.get('STOCK_HISTORY_TIMEOUT', 10)
+        },
+        fallbacks={'news': NO_NEWS}
+    )
+    
+    return parts['info'], parts['news'], parts['history']
+
+
+def sync_stock(stock_info: dict, ticker: str) -> int:
+    """ Adds or updates a stock in the database once per fetch of its info
+        Requests served the same cached info reuse the stock id, 
+        and concurrent writes for the same ticker are coalesced
+
+    Args:
+        stock_info (dict): info about the stock from get_stock_info
+        ticker (str): ticker of the stock
+
+    Returns:
+        int: id of the stock
+    """
+    synced = _synced_stocks.get(ticker)
+    
+    if synced is not None and synced[0] is stock_info:
+        return synced[1]
+    
+    def write() -> int:
+        stock_id = add_stock(stock_info, ticker)
+        _synced_stocks[ticker] = (stock_info, stock_id)
+        return stock_id
+    
+    return _stock_flight.do(ticker, write)
+
+
 def get_stock_prices(stock_tickers: list) -> Dict[str, float]:
     """ Gets the current price of a list of tickers
 
@@ -101,21 +318,31 @@ def get_stock_prices(stock_tickers: list) -> Dict[str, float]:
     Returns:
         dict: current price, previous close, and opening price of each ticker
     """
-    price_data = yf.Tickers(stock_tickers).tickers
-    data = {}
-    for ticker in stock_tickers:
-        try:
-            stock_info = price_data[ticker].info
-            data[ticker] = {
-                'curr_price': stock_info.get('currentPrice', None),
-                'prev_close': stock_info.get('previousClose', None),
-                'open_price': stock_info.get('open', None)
-            }
-        except Exception as e:
-            data[ticker] = {
-                'curr_price': None,
-                'prev_close': None,
-                'open_price': None
-            }
-    
-    return data
\ No newline at end of file
+    data, _ = fetch_stock_prices(stock_tickers)
+    
+    return data
+
+
+def fetch_stock_prices(stock_tickers: list, on_quotes: Callable = None) -> tuple:
+    """ Gets the current price of a list of tickers using concurrent batched requests
+        Worker pool, deadline and retries are set by the QUOTE_FETCH_* config
+
+    Args:
+        stock_tickers (list): list of tickers
+        on_quotes (Callable, optional): called with the quotes of each batch as it arrives. Defaults to None.
+
+    Returns:
+        tuple: dictionary of prices for each ticker and a FetchSummary of the run
+    """
+    config = current_app.config if has_app_context() else {}
+    
+    return fetch_quotes(
+        get_price_provider(),
+        stock_tickers,
+        workers=config.get('QUOTE_FETCH_WORKERS', 8),
+        batch_size=config.get('STOCK_PRICE_CHUNK_SIZE', 200),
+        timeout=config.get('QUOTE_FETCH_TIMEOUT', 15.0),
+        retries=config.get('QUOTE_FETCH_RETRIES', 2),
+        backoff=config.get('QUOTE_FETCH_BACKOFF', 0.5),
+        on_quotes=on_quotes
+    )
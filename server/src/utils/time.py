@@ -97,4 +97,52 @@ def get_next_market_date(est_time: datetime=None) -> str:
     elif est_time.hour >= 16:
         return get_next_market_date(est_time.date() + pd.DateOffset(days=1))
     else:
-        return est_time.date().strftime('%Y-%m-%d')
\ No newline at end of file
+        return est_time.date().strftime('%Y-%m-%d')
+
+
+def get_next_market_close(est_time: datetime=None) -> datetime:
+    """ Gets the time of the next market close (4pm EST)
+        If the market is currently open or has not opened yet, returns today's close
+
+    Args:
+        est_time (datetime, optional): time in EST
+
+    Returns:
+        datetime: datetime of the next market close in EST
+    """
+    est = pytz.timezone('US/Eastern')
+    date = datetime.strptime(get_next_market_date(est_time), '%Y-%m-%d')
+    
+    return est.localize(date.replace(hour=16))
+
+
+def get_period_start(period: str, end_date: datetime.date=None) -> datetime.date:
+    """ Gets the first date covered by a yfinance style period (e.g. '5d', '1mo', '1y', 'ytd', 'max')
+
+    Args:
+        period (str): length of the period
+        end_date (datetime.date, optional): last date of the period. Defaults to today in EST.
+
+    Raises:
+        Exception: invalid period
+
+    Returns:
+        datetime.date: first date of the period
+    """
+    if end_date is None:
+        end_date = get_est_time().date()
+        
+    if period == 'ytd':
+        return end_date.replace(month=1, day=1)
+    elif period == 'max':
+        return (pd.Timestamp(end_date) - pd.DateOffset(years=50)).date()
+    elif period.endswith('mo'):
+        offset = pd.DateOffset(months=int(period[:-2]))
+    elif period.endswith('d'):
+        offset = pd.DateOffset(days=int(period[:-1]))
+    elif period.endswith('y'):
+        offset = pd.DateOffset(years=int(period[:-1]))
+    else:
+        raise Exception('Invalid period')
+    
+    return (pd.Timestamp(end_date) - offset).date()
@@ -1,3 +1,7 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
 from src.data_models import db, Portfolio, Holding, Transaction, Stock
 from .time import get_est_time
 from .math_functions import round_number
@@ -5,6 +9,8 @@ from .math_functions import round_number
 # updating database
 def add_stock(stock_info: dict, ticker: str) -> int:
     """ Adds a stock to the database
+        The prices of an existing stock are only updated if the info is newer than them, 
+        so info served from a cache does not overwrite a fresher price refresh
 
     Args:
         stock_info (dict): info about the stock
@@ -14,15 +20,25 @@ def add_stock(stock_info: dict, ticker: str) -> int:
         int: id of the stock
     """
     price = stock_info.get('price')
+    last_updated = stock_info.get('lastUpdated') or get_est_time()
     
     stock = Stock.query.filter_by(ticker=ticker).first()
 
-    # if stock already exists, update price
+    # if stock already exists, update prices
     if stock is not None:
         id = stock.id
-        stock.current_price = price
-        stock.last_updated = get_est_time()
-
+        
+        db.session.execute(
+            update(Stock).where(
+                Stock.id == stock.id,
+                Stock.last_updated <= last_updated
+            ).values(
+                current_price=price,
+                opening_price=stock_info.get('open') or stock.opening_price,
+                previous_close=stock_info.get('prevClose') or stock.previous_close,
+                last_updated=last_updated
+            ).execution_options(synchronize_session=False)
+        )
         db.session.commit()
 
     # if stock does not exist, create new stock
@@ -36,7 +52,7 @@ def add_stock(stock_info: dict, ticker: str) -> int:
             previous_close=stock_info.get('prevClose', price),
             opening_price=stock_info.get('open', price),
             current_price=price,
-            last_updated=get_est_time()
+            last_updated=last_updated
         )
         db.session.add(new_stock)
         db.session.commit()
@@ -61,7 +77,8 @@ def record_transaction(portfolio_id: int, user_id: int, stock_id: str, transacti
         Exception: if stock does not exist
         ValueError: if insufficient funds
     """
-    portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=user_id).first()
+    # lock the portfolio until commit so fills by the scheduler or execution queue are not overwritten
+    portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=user_id).with_for_update().populate_existing().first()
     stock = Stock.query.filter_by(id=stock_id).first()
 
     if portfolio is None:
@@ -84,15 +101,22 @@ def record_transaction(portfolio_id: int, user_id: int, stock_id: str, transacti
     if transaction_value > cash:
         raise ValueError('Insufficient funds. Prices may have changed. Please refresh the page.')
     
-    add_transaction(portfolio_id, stock_id, transaction_type, shares, price) # add transaction to database
-    update_holding(portfolio_id, stock_id, shares, price, transaction_type) # update holding in database
+    add_transaction(portfolio_id, stock_id, transaction_type, shares, price, commit=False) # add transaction to database
+    update_holding(portfolio_id, stock_id, shares, price, transaction_type, commit=False) # update holding in database
     
     # update portfolio cash
     portfolio.available_cash = round_number(portfolio.available_cash - transaction_value, 2)
     db.session.commit()
     
     
-def add_transaction(portfolio_id: int, stock_id: int, transaction_type: str, shares: int, price: float) -> None:
+def add_transaction(
+    portfolio_id: int, 
+    stock_id: int, 
+    transaction_type: str, 
+    shares: int, 
+    price: float, 
+    commit=True
+) -> None:
     """ Adds transaction to the database
 
     Args:
@@ -101,14 +125,78 @@ def add_transaction(portfolio_id: int, stock_id: int, transaction_type: str, sha
         transaction_type (str): type of transaction (buy or sell)
         shares (int): number of shares
         price (float): price per share
+        commit (bool, optional): whether to commit. Defaults to True.
+
+    Raises:
+        Exception: if holding does not exist
+    """
+    holding = Holding.query.filter_by(portfolio_id=portfolio_id, stock_id=stock_id).first()
+    
+    new_transaction(holding, portfolio_id, stock_id, transaction_type, shares, price)
+
+    if commit:
+        db.session.commit()
+    
+    
+def update_holding(
+    portfolio_id: int, 
+    stock_id: int, 
+    shares: int, 
+    price: float, 
+    transaction_type: str, 
+    commit=True
+) -> None:
+    """ Updates the holding of a stock after a transaction
+
+    Args:
+        portfolio_id (int): id of portfolio
+        stock_id (int): if of stock
+        shares (int): number of shares
+        price (float): price per share
+        transaction_type (str): type of transaction (buy or sell)
+        commit (bool, optional): whether to commit. Defaults to True.
 
     Raises:
         Exception: if holding does not exist
+        ValueError: if insufficient shares
+    """
+    holding = Holding.query.filter_by(portfolio_id=portfolio_id, stock_id=stock_id).first()
+
+    apply_holding_change(holding, portfolio_id, stock_id, shares, price, transaction_type)
+
+    if commit:
+        db.session.commit()
+
+
+def new_transaction(
+    holding: Holding, 
+    portfolio_id: int, 
+    stock_id: int, 
+    transaction_type: str, 
+    shares: int, 
+    price: float, 
+    transaction_date: datetime = None
+) -> Transaction:
+    """ Adds a transaction to the session without committing
+        The profit/loss of a sell is taken from the holding before the sale
+
+    Args:
+        holding (Holding): holding of the stock before the transaction, None if there is none
+        portfolio_id (int): id of portfolio
+        stock_id (int): id of stock
+        transaction_type (str): type of transaction (buy or sell)
+        shares (int): number of shares
+        price (float): price per share
+        transaction_date (datetime, optional): time of the transaction. Defaults to now.
+
+    Raises:
+        Exception: if holding does not exist
+
+    Returns:
+        Transaction: new transaction
     """
     # if sell transaction, calculate profit/loss
     if transaction_type == 'sell':
-        holding = Holding.query.filter_by(portfolio_id=portfolio_id, stock_id=stock_id).first()
-
         if holding is None:
             raise Exception('You do not own this stock.')
         
@@ -117,7 +205,7 @@ def add_transaction(portfolio_id: int, stock_id: int, transaction_type: str, sha
         profit_loss = None
 
     transaction = Transaction(
-        transaction_date=get_est_time(),
+        transaction_date=transaction_date or get_est_time(),
         portfolio_id=portfolio_id, 
         stock_id=stock_id, 
         transaction_type=transaction_type, 
@@ -128,15 +216,24 @@ def add_transaction(portfolio_id: int, stock_id: int, transaction_type: str, sha
     )
 
     db.session.add(transaction)
-    db.session.commit()
-    
     
-def update_holding(portfolio_id: int, stock_id: int, shares: int, price: float, transaction_type: str) -> None:
-    """_summary_
+    return transaction
+
+
+def apply_holding_change(
+    holding: Holding, 
+    portfolio_id: int, 
+    stock_id: int, 
+    shares: int, 
+    price: float, 
+    transaction_type: str
+) -> Holding:
+    """ Applies a transaction to a holding in the session without committing
 
     Args:
+        holding (Holding): holding of the stock before the transaction, None if there is none
         portfolio_id (int): id of portfolio
-        stock_id (int): if of stock
+        stock_id (int): id of stock
         shares (int): number of shares
         price (float): price per share
         transaction_type (str): type of transaction (buy or sell)
@@ -144,19 +241,20 @@ def update_holding(portfolio_id: int, stock_id: int, shares: int, price: float,
     Raises:
         Exception: if holding does not exist
         ValueError: if insufficient shares
-    """
-    holding = Holding.query.filter_by(portfolio_id=portfolio_id, stock_id=stock_id).first()
 
+    Returns:
+        Holding: holding after the transaction, None if all shares were sold
+    """
     # if no holding, create new holding
     if holding is None:
         if transaction_type == 'buy':
-            new_holding = Holding(
+            holding = Holding(
                 portfolio_id=portfolio_id, 
                 stock_id=stock_id, 
                 shares_owned=shares, 
                 average_price=price
             )
-            db.session.add(new_holding)
+            db.session.add(holding)
         else:
             raise Exception('You do not own this stock.')
         
@@ -171,10 +269,11 @@ def update_holding(portfolio_id: int, stock_id: int, shares: int, price: float,
             raise ValueError('You do not own that many shares!')
         elif holding.shares_owned == shares:
             db.session.delete(holding)
+            holding = None
         else:
             holding.shares_owned -= shares
 
-    db.session.commit()
+    return holding
     
     
 # getting data
@@ -0,0 +1,352 @@
+import sqlite3
+from datetime import datetime, timedelta
+from itertools import groupby
+
+import numpy as np
+from sqlalchemy import func, or_, select, true, update
+
+from src.data_models import db, Portfolio, Holding, Stock, Game, Transaction
+from .math_functions import round_number
+
+
+def value_portfolios_orm(games: list, update_time: datetime) -> None:
+    """ Updates the value and day change of each portfolio by walking its holdings
+
+    Args:
+        games (list): list of Game objects that are 'In Progress'
+        update_time (datetime): time of the update
+    """
+    for game in games:
+        for portfolio in game.portfolios:
+            portfolio_value = portfolio.available_cash
+            
+            for holding in portfolio.holdings:
+                portfolio_value += (holding.shares_owned * holding.stock.current_price)
+                
+            portfolio.current_value = round_number(portfolio_value)
+            portfolio.day_change = round_number(portfolio.current_value-portfolio.last_close_value)
+            portfolio.last_updated = update_time
+
+
+def value_portfolios_sql(update_time: datetime, game_ids: list = None, portfolio_ids: list = None) -> int:
+    """ Updates the value and day change of all portfolios in games that are 'In Progress'
+        using one aggregate query over holdings joined to stocks and one bulk update
+
+    Args:
+        update_time (datetime): time of the update
+        game_ids (list, optional): only portfolios of these games. Defaults to all games.
+        portfolio_ids (list, optional): only these portfolios. Defaults to all portfolios.
+
+    Returns:
+        int: number of portfolios updated
+    """
+    holdings_value = func.coalesce(func.sum(Holding.shares_owned * Stock.current_price), 0)
+    
+    values = db.session.execute(
+        select(
+            Portfolio.id,
+            Portfolio.available_cash,
+            Portfolio.last_close_value,
+            holdings_value
+        ).join(
+            Game, Game.id == Portfolio.game_id
+        ).outerjoin(
+            Holding, Holding.portfolio_id == Portfolio.id
+        ).outerjoin(
+            Stock, Stock.id == Holding.stock_id
+        ).where(
+            Game.status == 'In Progress',
+            Game.id.in_(game_ids) if game_ids is not None else true(),
+            Portfolio.id.in_(portfolio_ids) if portfolio_ids is not None else true()
+        ).group_by(
+            Portfolio.id
+        )
+    ).all()
+    
+    updates = []
+    for portfolio_id, available_cash, last_close_value, holdings in values:
+        current_value = round_number(available_cash + holdings)
+        updates.append({
+            'id': portfolio_id,
+            'current_value': current_value,
+            'day_change': round_number(current_value - last_close_value),
+            'last_updated': update_time
+        })
+    
+    if updates:
+        db.session.execute(update(Portfolio), updates)
+    
+    return len(updates)
+
+
+def rank_portfolios(game_ids: list = None) -> int:
+    """ Updates the overall and daily rank of all portfolios in games that are 'In Progress'
+        Ranks are computed with window functions, or in python on SQLite versions without them.
+        Tied portfolios share a rank and the next rank is skipped (1, 2, 2, 4).
+
+    Args:
+        game_ids (list, optional): only portfolios of these games. Defaults to all games.
+
+    Returns:
+        int: number of portfolios ranked
+    """
+    if db.engine.dialect.name == 'sqlite' and sqlite3.sqlite_version_info < (3, 30):
+        ranks = _rank_portfolios_python(game_ids)
+    else:
+        ranks = _rank_portfolios_sql(game_ids)
+        
+    if ranks:
+        db.session.execute(update(Portfolio), ranks)
+        
+    return len(ranks)
+
+
+def _rank_portfolios_sql(game_ids: list = None) -> list:
+    rows = db.session.execute(
+        select(
+            Portfolio.id,
+            func.rank().over(
+                partition_by=Portfolio.game_id,
+                order_by=Portfolio.current_value.desc()
+            ),
+            func.rank().over(
+                partition_by=Portfolio.game_id,
+                order_by=Portfolio.day_change.desc().nulls_last()
+            )
+        ).join(
+            Game, Game.id == Portfolio.game_id
+        ).where(
+            Game.status == 'In Progress',
+            Game.id.in_(game_ids) if game_ids is not None else true()
+        )
+    ).all()
+    
+    return [
+        {'id': portfolio_id, 'overall_rank': overall_rank, 'daily_rank': daily_rank}
+        for portfolio_id, overall_rank, daily_rank in rows
+    ]
+
+
+def _rank_portfolios_python(game_ids: list = None) -> list:
+    rows = db.session.execute(
+        select(
+            Portfolio.id,
+            Portfolio.game_id,
+            Portfolio.current_value,
+            Portfolio.day_change
+        ).join(
+            Game, Game.id == Portfolio.game_id
+        ).where(
+            Game.status == 'In Progress',
+            Game.id.in_(game_ids) if game_ids is not None else true()
+        ).order_by(
+            Portfolio.game_id
+        )
+    ).all()
+    
+    ranks = {row.id: {'id': row.id} for row in rows}
+    
+    for _, portfolios in groupby(rows, key=lambda row: row.game_id):
+        portfolios = list(portfolios)
+        
+        for key, column in [('overall_rank', 2), ('daily_rank', 3)]:
+            for portfolio, rank in zip(portfolios, competition_ranks([row[column] for row in portfolios])):
+                ranks[portfolio.id][key] = rank
+    
+    return list(ranks.values())
+
+
+def competition_ranks(values: list) -> list:
+    """ Ranks values in descending order, tied values share a rank and the next rank is skipped (1, 2, 2, 4)
+        Missing values rank last
+
+    Args:
+        values (list): values to rank
+
+    Returns:
+        list: rank of each value
+    """
+    order = sorted(range(len(values)), key=lambda i: (values[i] is None, -(values[i] or 0)))
+    ranks = [0] * len(values)
+    
+    for position, i in enumerate(order):
+        if position > 0 and values[i] == values[order[position-1]]:
+            ranks[i] = ranks[order[position-1]]
+        else:
+            ranks[i] = position+1
+    
+    return ranks
+
+
+def value_portfolios_numpy(update_time: datetime, game_ids: list = None) -> int:
+    """ Updates the value, day change and ranks of all portfolios in games that are 'In Progress'
+        Holdings are loaded once into flat arrays, values are summed with bincount 
+        and ranks are computed per game with lexsort, then everything is written in one bulk update
+
+    Args:
+        update_time (datetime): time of the update
+        game_ids (list, optional): only portfolios of these games. Defaults to all games.
+
+    Returns:
+        int: number of portfolios updated
+    """
+    portfolios = db.session.execute(
+        select(
+            Portfolio.id,
+            Portfolio.game_id,
+            Portfolio.available_cash,
+            Portfolio.last_close_value
+        ).join(
+            Game, Game.id == Portfolio.game_id
+        ).where(
+            Game.status == 'In Progress',
+            Game.id.in_(game_ids) if game_ids is not None else true()
+        ).order_by(
+            Portfolio.id
+        )
+    ).all()
+    
+    if not portfolios:
+        return 0
+    
+    holdings = db.session.execute(
+        select(
+            Holding.portfolio_id,
+            Holding.shares_owned,
+            Stock.current_price
+        ).join(
+            Stock, Stock.id == Holding.stock_id
+        ).join(
+            Portfolio, Portfolio.id == Holding.portfolio_id
+        ).join(
+            Game, Game.id == Portfolio.game_id
+        ).where(
+            Game.status == 'In Progress',
+            Game.id.in_(game_ids) if game_ids is not None else true()
+        )
+    ).all()
+    
+    portfolio_ids, portfolio_games, cash, last_close = (np.array(column) for column in zip(*portfolios))
+    cash = cash.astype(float)
+    last_close = last_close.astype(float)
+    
+    # portfolio value
+    if holdings:
+        holding_portfolios, shares, prices = (np.array(column) for column in zip(*holdings))
+        portfolio_index = np.searchsorted(portfolio_ids, holding_portfolios)
+        holdings_value = np.bincount(
+            portfolio_index, 
+            weights=shares.astype(float) * prices.astype(float), 
+            minlength=len(portfolio_ids)
+        )
+    else:
+        holdings_value = np.zeros(len(portfolio_ids))
+        
+    values = np.round(cash + holdings_value, 4)
+    day_changes = np.round(values - last_close, 4)
+    
+    # rankings within each game
+    overall_ranks = _rank_within_groups(portfolio_games, values)
+    daily_ranks = _rank_within_groups(portfolio_games, day_changes)
+    
+    db.session.execute(update(Portfolio), [
+        {
+            'id': int(portfolio_ids[i]),
+            'current_value': float(values[i]),
+            'day_change': float(day_changes[i]),
+            'last_updated': update_time,
+            'overall_rank': int(overall_ranks[i]),
+            'daily_rank': int(daily_ranks[i])
+        }
+        for i in range(len(portfolio_ids))
+    ])
+    
+    return len(portfolio_ids)
+
+
+def _rank_within_groups(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # competition rank (1, 2, 2, 4) of each value in descending order within its group
+    order = np.lexsort((-values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    positions = np.arange(len(order))
+    
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    new_value = new_group.copy()
+    new_value[1:] |= sorted_values[1:] != sorted_values[:-1]
+    
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    tie_start = np.maximum.accumulate(np.where(new_value, positions, 0))
+    
+    ranks = np.empty(len(order), dtype=int)
+    ranks[order] = tie_start - group_start + 1
+    
+    return ranks
+
+
+class IncrementalValuation:
+    """ Finds the portfolios affected since the previous tick so only those are revalued and only their games reranked
+        Affected portfolios are selected in one query: holders of stocks whose price moved since the previous valuation, 
+        portfolios that traded since the previous tick, portfolios valued by another process, 
+        portfolios whose day change is out of date and new portfolios, which are not ranked yet. 
+        Only the price of each stock is kept between ticks.
+        Every portfolio is revalued on the first tick and on the first tick of a day, when the day changes reset.
+        
+        Affected portfolios are revalued in full by the PORTFOLIO_VALUATION engine rather than by adding 
+        price change x shares to their previous value: a delta update needs the unrounded holdings value 
+        of every portfolio kept between ticks, and the sql engine only reads the holdings of the affected portfolios. 
+        The numpy and orm engines revalue every portfolio of the affected games.
+    """
+    # transactions are dated before they are committed
+    margin = timedelta(minutes=1)
+    
+    def __init__(self):
+        self.since = None
+        self.prices = {}
+    
+    def affected(self, game_ids: list, update_time: datetime) -> tuple:
+        """ Gets the portfolios of games to revalue at update_time and records update_time as the previous tick
+
+        Args:
+            game_ids (list): ids of the games being valued
+            update_time (datetime): time of the update
+
+        Returns:
+            tuple: ids of the affected portfolios and ids of their games, 
+                or None and game_ids when every portfolio has to be revalued
+        """
+        prices = dict(db.session.execute(select(Stock.id, Stock.current_price)).all())
+        
+        since, self.since = self.since, update_time
+        previous, self.prices = self.prices, prices
+        
+        if since is None or since.date() != update_time.date():
+            return None, game_ids
+        
+        moved = [stock_id for stock_id, price in prices.items() if previous.get(stock_id) != price]
+        
+        rows = db.session.execute(
+            select(Portfolio.id, Portfolio.game_id).where(
+                Portfolio.game_id.in_(game_ids),
+                or_(
+                    Portfolio.id.in_(select(Holding.portfolio_id).where(Holding.stock_id.in_(moved))),
+                    Portfolio.id.in_(
+                        select(Transaction.portfolio_id).where(Transaction.transaction_date >= since - self.margin)
+                    ),
+                    Portfolio.last_updated > since,
+                    Portfolio.overall_rank.is_(None),
+                    # last close values are reset before the market opens
+                    Portfolio.day_change.is_(None),
+                    func.abs(Portfolio.current_value - Portfolio.last_close_value - Portfolio.day_change) > 1e-4
+                )
+            )
+        ).all()
+        
+        return [row.id for row in rows], sorted({row.game_id for row in rows})
+    
+    def reset(self) -> None:
+        """ Forgets the previous tick so the next one revalues every portfolio
+        """
+        self.since = None
+        self.prices.clear()
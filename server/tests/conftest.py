@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# the app reads its config from the environment when it is imported
+os.environ['PROD_DB_URL'] = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "test.db")}'
+os.environ.setdefault('PROD_SECRET_KEY', 'test')
+os.environ.setdefault('PRICE_PROVIDER', 'synthetic')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app
+from src.data_models import db, User, Game, Stock, Portfolio
+from src.utils.time import get_est_time
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def game(app):
+    return add_game()
+
+
+def add_game() -> Game:
+    now = get_est_time()
+    user = User(email='test@funance', password='', username='test', creation_date=now)
+    db.session.add(user)
+    db.session.flush()
+    
+    game = Game(
+        creator_id=user.id, name='test', creation_date=now, participants=0, start_date=now.date(),
+        status='In Progress', starting_cash=1000, transaction_fee=0, fee_type='Flat Fee'
+    )
+    db.session.add(game)
+    db.session.commit()
+    
+    return game
+
+
+def add_stock(ticker: str, price: float) -> Stock:
+    stock = Stock(
+        company_name=ticker, ticker=ticker, currency='USD', previous_close=price, 
+        opening_price=price, current_price=price, last_updated=get_est_time()
+    )
+    db.session.add(stock)
+    db.session.commit()
+    
+    return stock
+
+
+def add_portfolio(game: Game, cash: float) -> Portfolio:
+    portfolio = Portfolio(
+        user_id=game.creator_id, game_id=game.id, available_cash=cash, creation_date=get_est_time(),
+        current_value=cash, last_updated=get_est_time(), last_close_value=cash
+    )
+    db.session.add(portfolio)
+    game.participants += 1
+    db.session.commit()
+    
+    return portfolio
@@ -0,0 +1,55 @@
+import pytest
+
+from src.data_models import db, Order
+from src.utils import execution_queue
+from src.utils.execution_queue import ExecutionQueue
+from src.utils.time import get_est_time
+from conftest import add_stock, add_portfolio
+
+
+@pytest.fixture
+def queue(app, monkeypatch):
+    monkeypatch.setattr(execution_queue, 'check_market_closed', lambda: False)
+    return ExecutionQueue()
+
+
+def add_market_order(portfolio, stock, order_type: str, shares: int) -> Order:
+    order = Order(
+        stock_id=stock.id, portfolio_id=portfolio.id, order_type=order_type, shares=shares,
+        target_price=None, order_date=get_est_time(), order_status='pending'
+    )
+    db.session.add(order)
+    db.session.commit()
+
+    return order
+
+
+def test_counts_fills_and_cancellations(queue, game):
+    stock = add_stock('AAA', 8)
+    portfolio = add_portfolio(game, 100)
+
+    bought = add_market_order(portfolio, stock, 'market buy', 5)
+    partially_bought = add_market_order(portfolio, stock, 'market buy', 20)
+    unaffordable = add_market_order(portfolio, stock, 'market buy', 1)
+    no_holding = add_market_order(add_portfolio(game, 100), stock, 'market sell', 1)
+
+    for order in [bought, partially_bought, unaffordable, no_holding]:
+        queue._execute(order.id, 0.0)
+
+    assert [db.session.get(Order, order.id).order_status for order in [bought, partially_bought, unaffordable, no_holding]] == [
+        'filled', 'partially filled', 'cancelled', 'cancelled'
+    ]
+    assert (queue.filled, queue.cancelled, queue.skipped, queue.failed) == (2, 2, 0, 0)
+    assert len(queue.latencies) == 2
+
+
+def test_skips_orders_that_are_no_longer_pending(queue, game):
+    stock = add_stock('AAA', 8)
+    order = add_market_order(add_portfolio(game, 100), stock, 'market buy', 1)
+    order.order_status = 'cancelled'
+    db.session.commit()
+
+    queue._execute(order.id, 0.0)
+
+    assert (queue.filled, queue.skipped) == (0, 1)
+    assert len(queue.latencies) == 0
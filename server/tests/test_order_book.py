@@ -0,0 +1,69 @@
+import pytest
+
+from src.data_models import db, Order
+from src.utils.order_book import OrderBook
+from src.utils.time import get_est_time
+from conftest import add_stock, add_portfolio
+
+
+def add_order(portfolio, stock, order_type: str, target_price: float) -> Order:
+    order = Order(
+        stock_id=stock.id, portfolio_id=portfolio.id, order_type=order_type, shares=1,
+        target_price=target_price, order_date=get_est_time(), order_status='pending'
+    )
+    db.session.add(order)
+    db.session.commit()
+
+    return order
+
+
+@pytest.fixture
+def book(game):
+    stock = add_stock('AAA', 10)
+    portfolio = add_portfolio(game, 1000)
+    orders = {
+        (order_type, target_price): add_order(portfolio, stock, order_type, target_price).id
+        for order_type in ['limit buy', 'limit sell', 'stop-loss']
+        for target_price in [9, 10, 11]
+    }
+    book = OrderBook()
+    book.rebuild()
+
+    return book, stock, portfolio, orders
+
+
+@pytest.mark.parametrize('price, triggered', [
+    # limit buys and stop-losses trigger at or below their target, limit sells at or above it
+    (10, [('limit buy', 10), ('limit buy', 11), ('limit sell', 9), ('limit sell', 10), ('stop-loss', 10), ('stop-loss', 11)]),
+    (9.99, [('limit buy', 10), ('limit buy', 11), ('limit sell', 9), ('stop-loss', 10), ('stop-loss', 11)]),
+    (10.01, [('limit buy', 11), ('limit sell', 9), ('limit sell', 10), ('stop-loss', 11)]),
+    (8, [('limit buy', 9), ('limit buy', 10), ('limit buy', 11), ('stop-loss', 9), ('stop-loss', 10), ('stop-loss', 11)]),
+    (12, [('limit sell', 9), ('limit sell', 10), ('limit sell', 11)]),
+])
+def test_triggered_boundaries(book, price, triggered):
+    book, stock, _, orders = book
+
+    assert sorted(book.triggered(stock.id, price)) == sorted(orders[key] for key in triggered)
+
+
+def test_triggered_without_price_or_orders(book):
+    book, stock, _, _ = book
+
+    assert book.triggered(stock.id, None) == []
+    assert book.triggered(stock.id + 1, 10) == []
+
+
+def test_load_new_and_sync(book):
+    book, stock, portfolio, orders = book
+    cancelled = db.session.get(Order, orders[('limit buy', 11)])
+    cancelled.order_status = 'cancelled'
+    new = add_order(portfolio, stock, 'limit sell', 10)
+    add_order(portfolio, stock, 'market buy', None)
+
+    # only orders placed since the last load are read, cancellations wait for the sync
+    book.load_new()
+    assert len(book) == 10 and new.id in book.triggered(stock.id, 10)
+    assert cancelled.id in book.triggered(stock.id, 10)
+
+    book.sync()
+    assert len(book) == 9 and cancelled.id not in book.triggered(stock.id, 10)
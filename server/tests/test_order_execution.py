@@ -0,0 +1,127 @@
+import random
+
+import pytest
+from sqlalchemy import text
+
+from src.data_models import db, Portfolio, Holding, Order, Transaction
+from src.utils.order import check_orders, execute_orders
+from src.utils.time import get_est_time
+from conftest import add_game, add_stock, add_portfolio
+
+
+def seed_orders(game) -> list:
+    # portfolios with several orders each, including partial fills, oversized sells and sells without a holding
+    rng = random.Random(0)
+    stocks = [add_stock(f'S{i}', rng.uniform(5, 50)) for i in range(5)]
+    portfolios = [add_portfolio(game, rng.choice([50, 200, 1000])) for _ in range(6)]
+
+    for portfolio in portfolios:
+        for stock in rng.sample(stocks, 2):
+            db.session.add(Holding(portfolio_id=portfolio.id, stock_id=stock.id, shares_owned=rng.randint(1, 10), average_price=20))
+
+    for _ in range(40):
+        order_type = rng.choice(['limit buy', 'limit sell', 'stop-loss', 'market buy', 'market sell'])
+        db.session.add(Order(
+            stock_id=rng.choice(stocks).id,
+            portfolio_id=rng.choice(portfolios).id,
+            order_type=order_type,
+            shares=rng.randint(1, 12),
+            target_price=None if order_type.startswith('market') else rng.uniform(5, 50),
+            order_date=get_est_time(),
+            order_status='pending'
+        ))
+    db.session.commit()
+
+    return Order.query.order_by(Order.id).all()
+
+
+def database_state() -> tuple:
+    return (
+        sorted((p.id, p.available_cash) for p in Portfolio.query.all()),
+        sorted((h.portfolio_id, h.stock_id, h.shares_owned, h.average_price) for h in Holding.query.all()),
+        sorted((o.id, o.order_status) for o in Order.query.all()),
+        sorted(
+            (t.portfolio_id, t.stock_id, t.transaction_type, t.number_of_shares, t.price_per_share, t.profit_loss)
+            for t in Transaction.query.all()
+        )
+    )
+
+
+def test_batch_execution_matches_single(app):
+    states = {}
+
+    for execution in ['single', 'batch']:
+        # start each run from the same data
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+        app.config['ORDER_EXECUTION'] = execution
+        orders = seed_orders(add_game())
+
+        check_orders(orders)
+        db.session.commit()
+        db.session.expire_all()
+        states[execution] = database_state()
+
+    assert states['single'] == states['batch']
+    assert any(status != 'pending' for _, status in states['batch'][2])
+
+
+@pytest.mark.parametrize('execution', ['single', 'batch'])
+def test_fill_uses_latest_cash(app, game, execution):
+    app.config['ORDER_EXECUTION'] = execution
+    stock = add_stock('AAA', 8)
+    portfolio = add_portfolio(game, 1000)
+    db.session.add(Order(
+        stock_id=stock.id, portfolio_id=portfolio.id, order_type='limit buy', shares=10,
+        target_price=10, order_date=get_est_time(), order_status='pending'
+    ))
+    db.session.commit()
+
+    # loaded before a concurrent trade debits the portfolio on another connection
+    orders = Order.query.all()
+    assert orders[0].portfolio.available_cash == 1000
+
+    with db.engine.begin() as connection:
+        connection.execute(text('UPDATE portfolio SET available_cash = available_cash - 500 WHERE id = :id'), {'id': portfolio.id})
+
+    check_orders(orders)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert db.session.get(Portfolio, portfolio.id).available_cash == 420
+    assert db.session.get(Order, orders[0].id).order_status == 'filled'
+
+
+def test_failed_order_is_rolled_back_alone(app, game, monkeypatch):
+    stock = add_stock('AAA', 8)
+    portfolio = add_portfolio(game, 1000)
+    for _ in range(3):
+        db.session.add(Order(
+            stock_id=stock.id, portfolio_id=portfolio.id, order_type='market buy', shares=10,
+            target_price=None, order_date=get_est_time(), order_status='pending'
+        ))
+    db.session.commit()
+    orders = Order.query.order_by(Order.id).all()
+
+    import src.utils.order as order_module
+    fill_order = order_module._fill_order
+
+    def failing_fill(order, holding, fill_time):
+        holding = fill_order(order, holding, fill_time)
+        if order.id == orders[1].id:
+            db.session.flush()
+            raise Exception('failed fill')
+        return holding
+
+    monkeypatch.setattr(order_module, '_fill_order', failing_fill)
+    results = execute_orders(orders)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert results['filled'] == 2 and results['failed'] == 1
+    assert [order.order_status for order in Order.query.order_by(Order.id)] == ['filled', 'pending', 'filled']
+    assert db.session.get(Portfolio, portfolio.id).available_cash == 840
+    assert Holding.query.one().shares_owned == 20
+    assert Transaction.query.count() == 2
@@ -0,0 +1,64 @@
+from threading import Event
+
+from src.utils.price_provider import SyntheticPriceProvider
+from src.utils.quote_fetcher import fetch_quotes
+
+
+def test_failed_callback_batch_is_retried():
+    tickers = [f'S{i}' for i in range(6)]
+    batches = []
+
+    def on_quotes(quotes: dict) -> None:
+        batches.append(sorted(quotes))
+        if len(batches) == 1:
+            raise Exception('failed batch')
+
+    data, summary = fetch_quotes(
+        SyntheticPriceProvider(), tickers, workers=1, batch_size=3, backoff=0.0, on_quotes=on_quotes
+    )
+
+    assert batches[0] in batches[1:]
+    assert sorted(ticker for batch in batches[1:] for ticker in batch) == tickers
+    assert summary.errors == 1 and summary.retries == 3 and not summary.failed
+    assert all(quote['curr_price'] is not None for quote in data.values())
+
+
+def test_batch_failing_every_callback_is_reported_failed():
+    def on_quotes(quotes: dict) -> None:
+        raise Exception('failed batch')
+
+    data, summary = fetch_quotes(
+        SyntheticPriceProvider(), ['AAA', 'BBB'], retries=1, backoff=0.0, on_quotes=on_quotes
+    )
+
+    assert sorted(summary.failed) == ['AAA', 'BBB'] and summary.errors == 2
+    assert all(quote['curr_price'] is None for quote in data.values())
+
+
+class HangingProvider(SyntheticPriceProvider):
+    # the first call hangs until released
+    def __init__(self):
+        super().__init__()
+        self.release = Event()
+        self.calls = 0
+
+    def get_quotes(self, tickers: list) -> dict:
+        self.calls += 1
+        if self.calls == 1:
+            self.release.wait()
+        return super().get_quotes(tickers)
+
+
+def test_hung_batch_does_not_block_later_batches():
+    provider = HangingProvider()
+
+    try:
+        data, summary = fetch_quotes(
+            provider, ['AAA', 'BBB', 'CCC'], workers=1, batch_size=1, timeout=0.2, retries=1, backoff=0.0
+        )
+    finally:
+        provider.release.set()
+
+    # only the hung batch timed out, the others ran on the replacement pool
+    assert summary.timeouts == 1 and not summary.failed
+    assert all(quote['curr_price'] is not None for quote in data.values())
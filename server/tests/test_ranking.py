@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src.data_models import db, Game, Portfolio
+from src.utils.valuation import competition_ranks, rank_portfolios, _rank_portfolios_python, _rank_within_groups
+from conftest import add_portfolio
+
+
+@pytest.mark.parametrize('values, ranks', [
+    ([10, 5, 5, 1], [1, 2, 2, 4]),
+    # the first value is 0
+    ([0, 0, -1], [1, 1, 3]),
+    ([0], [1]),
+    ([-1, 0, 2], [3, 2, 1]),
+    ([-3, -3, -1], [2, 2, 1]),
+    # missing values rank last and tie with each other
+    ([None, 3, None, 0], [3, 1, 3, 2]),
+    ([], []),
+])
+def test_competition_ranks(values, ranks):
+    assert competition_ranks(values) == ranks
+
+
+def test_ranking_paths_agree(game):
+    other_game = Game(
+        creator_id=game.creator_id, name='other', creation_date=game.creation_date, participants=0,
+        start_date=game.start_date, status='In Progress', starting_cash=1000, transaction_fee=0, fee_type='Flat Fee'
+    )
+    db.session.add(other_game)
+    db.session.commit()
+
+    # (current value, day change) of each portfolio, with ties and zero day changes
+    games = {
+        game: [(10, 0), (5, -2), (5, 0), (1, 3)],
+        other_game: [(0, 0), (7, 1), (0, -1)]
+    }
+    for parent, values in games.items():
+        for current_value, day_change in values:
+            portfolio = add_portfolio(parent, current_value)
+            portfolio.day_change = day_change
+    db.session.commit()
+
+    portfolios = Portfolio.query.order_by(Portfolio.id).all()
+
+    python_ranks = {row['id']: (row['overall_rank'], row['daily_rank']) for row in _rank_portfolios_python()}
+
+    rank_portfolios()
+    db.session.commit()
+    db.session.expire_all()
+    sql_ranks = {portfolio.id: (portfolio.overall_rank, portfolio.daily_rank) for portfolio in portfolios}
+
+    groups = np.array([portfolio.game_id for portfolio in portfolios])
+    numpy_ranks = dict(zip(
+        [portfolio.id for portfolio in portfolios],
+        zip(
+            _rank_within_groups(groups, np.array([portfolio.current_value for portfolio in portfolios], dtype=float)).tolist(),
+            _rank_within_groups(groups, np.array([portfolio.day_change for portfolio in portfolios], dtype=float)).tolist()
+        )
+    ))
+
+    assert sql_ranks == python_ranks == numpy_ranks
+    assert [sql_ranks[portfolio.id] for portfolio in portfolios] == [
+        (1, 2), (2, 4), (2, 2), (4, 1),
+        (2, 2), (1, 1), (2, 3)
+    ]
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from src.data_models import db, Stock, StockHistory
+from src.utils import stock_data
+from src.utils.price_provider import SyntheticPriceProvider
+from src.utils.stock_data import get_stock_cache, sync_stock_history
+from src.utils.time import get_est_time
+from src.utils.transaction import add_stock
+from conftest import add_stock as add_test_stock
+
+
+def test_stale_info_does_not_overwrite_newer_price(app):
+    stock = add_test_stock('AAA', 10)
+    refreshed = get_est_time()
+    stock.last_updated = refreshed
+    db.session.commit()
+
+    add_stock({'price': 8, 'lastUpdated': refreshed - timedelta(minutes=5)}, 'AAA')
+    db.session.expire_all()
+    assert db.session.get(Stock, stock.id).current_price == 10
+
+    add_stock({'price': 12, 'lastUpdated': refreshed + timedelta(seconds=1)}, 'AAA')
+    db.session.expire_all()
+    assert db.session.get(Stock, stock.id).current_price == 12
+
+
+def test_info_is_not_served_stale_by_default(app):
+    assert get_stock_cache('info').stale_while_revalidate is False
+    assert get_stock_cache('news').stale_while_revalidate is True
+
+
+class RecordingProvider(SyntheticPriceProvider):
+    # records the start of each history fetch, history begins at listed
+    def __init__(self, listed=None):
+        super().__init__()
+        self.listed = listed
+        self.starts = []
+
+    def get_history(self, ticker: str, period='5y', start=None) -> pd.DataFrame:
+        self.starts.append(start)
+        history = super().get_history(ticker, period, start)
+        
+        return history[history.index >= pd.Timestamp(self.listed)] if self.listed is not None else history
+
+
+@pytest.fixture
+def provider(app, monkeypatch):
+    provider = RecordingProvider()
+    monkeypatch.setattr(stock_data, 'get_price_provider', lambda: provider)
+    
+    return provider
+
+
+def stored_dates() -> list:
+    return [date for date, in db.session.query(StockHistory.date).order_by(StockHistory.date)]
+
+
+def test_history_is_fetched_incrementally(provider):
+    start = get_est_time().date() - timedelta(days=60)
+    sync_stock_history('AAA', start)
+    dates = stored_dates()
+    assert provider.starts == [start] and dates[0] >= start
+
+    # only the days after the last stored bar are fetched
+    StockHistory.query.filter(StockHistory.date > dates[-6]).delete()
+    db.session.commit()
+    sync_stock_history('AAA', start)
+    assert provider.starts[-1] == dates[-6] and stored_dates() == dates
+
+    # an earlier period is fetched in full
+    earlier = start - timedelta(days=30)
+    sync_stock_history('AAA', earlier)
+    assert provider.starts[-1] == earlier and stored_dates()[0] < dates[0]
+
+
+def test_period_before_listing_stays_covered(provider):
+    start = get_est_time().date() - timedelta(days=60)
+    provider.listed = start + timedelta(days=20)
+    sync_stock_history('AAA', start)
+    assert stored_dates()[0] >= provider.listed
+
+    # the coverage is read from the database, not from the fetching process
+    db.session.remove()
+    sync_stock_history('AAA', start)
+    assert start not in provider.starts[1:]
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from src.data_models import db, Holding, Transaction
+from src.utils.time import get_est_time
+from src.utils.valuation import IncrementalValuation, value_portfolios_sql, rank_portfolios
+from conftest import add_stock, add_portfolio
+
+
+def value(game, update_time) -> None:
+    value_portfolios_sql(update_time, [game.id])
+    rank_portfolios([game.id])
+    db.session.commit()
+
+
+def test_affected_portfolios(game):
+    valuation = IncrementalValuation()
+    moving, steady = add_stock('AAA', 10), add_stock('BBB', 20)
+    holder, trader, idle = [add_portfolio(game, 100) for _ in range(3)]
+    db.session.add_all([
+        Holding(portfolio_id=holder.id, stock_id=moving.id, shares_owned=2, average_price=10),
+        Holding(portfolio_id=trader.id, stock_id=steady.id, shares_owned=1, average_price=20),
+        Holding(portfolio_id=idle.id, stock_id=steady.id, shares_owned=1, average_price=20)
+    ])
+    db.session.commit()
+
+    update_time = get_est_time()
+    assert valuation.affected([game.id], update_time) == (None, [game.id])
+    value(game, update_time)
+
+    # nothing changed
+    update_time += timedelta(seconds=1)
+    assert valuation.affected([game.id], update_time) == ([], [])
+    value(game, update_time)
+
+    moving.current_price = 12
+    db.session.add(Transaction(
+        portfolio_id=trader.id, stock_id=steady.id, transaction_date=get_est_time(), transaction_type='buy',
+        number_of_shares=1, price_per_share=20, total_value=20
+    ))
+    db.session.commit()
+
+    update_time += timedelta(seconds=1)
+    portfolio_ids, game_ids = valuation.affected([game.id], update_time)
+    assert sorted(portfolio_ids) == sorted([holder.id, trader.id]) and game_ids == [game.id]
+    value(game, update_time)
+
+    # the trade is still within the margin of the next tick
+    update_time += timedelta(minutes=2)
+    assert valuation.affected([game.id], update_time) == ([trader.id], [game.id])
+    value(game, update_time)
+
+    # last close value reset before the market opens
+    idle.last_close_value = idle.current_value + 5
+    db.session.commit()
+
+    update_time += timedelta(minutes=2)
+    assert valuation.affected([game.id], update_time) == ([idle.id], [game.id])
+
+    # the day changes reset the next morning
+    assert valuation.affected([game.id], update_time + timedelta(days=1)) == (None, [game.id])
@@ -0,0 +1,153 @@
+import functools
+import signal
+import sys
+import time
+
+from flask_apscheduler import APScheduler
+
+from app import app
+from src.utils.leader import LeaderLock
+from src.utils.metrics import track_job
+from src.utils.scheduler import (
+    # run when markets open
+    update_last_close_value, update_started_games, drop_prev_day_data, drop_old_price_ticks,
+    # run periodically when markets are open
+    update_stock_prices, update_portfolios, save_daily_history,
+    # run at end of trading day
+    save_closing_history, update_completed_games, close_expired_orders
+)
+from src.utils.pipeline import run_tick
+from src.utils.sharding import run_sharded_tick, shutdown_shard_pool
+
+# scheduler worker, run as its own process (python worker.py) so web workers can scale freely
+# any number of workers can run, the leader lock makes only one of them run the jobs
+
+leader = LeaderLock('scheduler', ttl=app.config.get('SCHEDULER_LEASE_TTL', 180))
+
+# initiate scheduler
+scheduler = APScheduler()
+scheduler.init_app(app)
+
+# define jobs
+def run_periodically():
+    with app.app_context():
+        shard_workers = app.config.get('SCHEDULER_SHARD_WORKERS', 0)
+        
+        if shard_workers > 1:
+            run_sharded_tick(shard_workers)
+        elif app.config.get('SCHEDULER_FUSED_TICK', False):
+            run_tick()
+        else:
+            update_stock_prices()
+            update_portfolios()
+            save_daily_history()
+
+def run_at_open():
+    with app.app_context():
+        update_last_close_value()
+        update_started_games()
+        drop_prev_day_data()
+        drop_old_price_ticks()
+
+        run_periodically()
+        
+def run_at_close():
+    with app.app_context():
+        run_periodically()
+
+        save_closing_history()
+        update_completed_games()
+        close_expired_orders()
+
+def renew_leader():
+    with app.app_context():
+        try:
+            leader.acquire()
+        except Exception as e:
+            app.logger.warning(f'scheduler lock renewal failed: {e}')
+
+def leader_only(func):
+    @functools.wraps(func)
+    def wrapper():
+        with app.app_context():
+            if not leader.acquire():
+                app.logger.info(f'skipping {func.__name__}, another worker holds the scheduler lock')
+                return
+        
+            with track_job(func.__name__):
+                func()
+        
+    return wrapper
+
+# add jobs
+scheduler.add_job(
+    id='run_at_open', 
+    func=leader_only(run_at_open), 
+    trigger='cron', 
+    day_of_week='mon-fri',
+    hour='9', 
+    minute='30', 
+    timezone='US/Eastern',
+    misfire_grace_time=None
+)
+
+scheduler.add_job(
+    id='run_935-955',
+    func=leader_only(run_periodically),
+    trigger='cron',
+    day_of_week='mon-fri', 
+    hour='9', 
+    minute='35-55/5',
+    timezone='US/Eastern',
+    misfire_grace_time=300
+)
+
+scheduler.add_job(
+    id='run_10-1359',
+    func=leader_only(run_periodically),
+    trigger='cron',
+    day_of_week='mon-fri', 
+    hour='10-15', 
+    minute='*/5',
+    timezone='US/Eastern',
+    misfire_grace_time=300
+)
+
+scheduler.add_job(
+    id='run_at_close',
+    func=leader_only(run_at_close),
+    trigger='cron',
+    day_of_week='mon-fri',
+    hour='16',
+    minute='0',
+    timezone='US/Eastern',
+    misfire_grace_time=None
+)
+
+scheduler.add_job(
+    id='renew_leader',
+    func=renew_leader,
+    trigger='interval',
+    seconds=max(leader.ttl // 3, 1)
+)
+
+
+def shutdown(*_):
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    signal.signal(signal.SIGTERM, shutdown)
+    
+    renew_leader()
+    scheduler.start()
+    
+    try:
+        while True:
+            time.sleep(60)
+    except (KeyboardInterrupt, SystemExit):
+        scheduler.shutdown()
+        shutdown_shard_pool()
+        
+        with app.app_context():
+            leader.release()